@@ -2,7 +2,55 @@
 # Author: Huy Vu
 # Description: Manages logging and retrieval of calories burned through activities.
 
-from data_storage import DataStorage
+from collections import defaultdict
+
+# MET (metabolic equivalent of task) values, from the Compendium of Physical Activities
+ACTIVITY_METS = {
+    'walking': 3.5,
+    'brisk walking': 4.3,
+    'hiking': 6.0,
+    'jogging': 7.0,
+    'running': 9.8,
+    'cycling': 7.5,
+    'stationary bike': 6.8,
+    'swimming': 6.0,
+    'rowing': 7.0,
+    'elliptical': 5.0,
+    'stair climbing': 8.8,
+    'jump rope': 12.3,
+    'aerobics': 7.3,
+    'dancing': 5.0,
+    'yoga': 2.5,
+    'pilates': 3.0,
+    'weight lifting': 3.5,
+    'basketball': 6.5,
+    'soccer': 7.0,
+    'tennis': 7.3
+}
+
+# Calories burned per kg of body weight per minute, precomputed once from the MET table
+# (kcal/min = MET * 3.5 * weight_kg / 200)
+CALORIES_PER_KG_MINUTE = {activity: met * 3.5 / 200 for activity, met in ACTIVITY_METS.items()}
+
+def calculate_activity_calories(activity, minutes, weight_kg):
+    """
+    Calculates the calories burned by an activity from its MET value.
+
+    Parameters:
+        activity (str): Activity name from ACTIVITY_METS.
+        minutes (float): Duration of the activity in minutes.
+        weight_kg (float): Body weight in kilograms.
+
+    Returns:
+        float: Calories burned.
+    """
+    if minutes <= 0:
+        raise ValueError(f"Duration must be greater than zero minutes, got {minutes}")
+    try:
+        factor = CALORIES_PER_KG_MINUTE[activity.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown activity: {activity}")
+    return factor * weight_kg * minutes
 
 class ActivityLog:
     def __init__(self, data_storage):
@@ -12,9 +60,35 @@ class ActivityLog:
         self.data_storage.save_calories_burned(date, calories)
         print(f"Logged {calories} calories burned on {date}.")
 
+    def log_activity(self, date, activity, minutes, weight_kg):
+        calories = calculate_activity_calories(activity, minutes, weight_kg)
+        self.data_storage.save_calories_burned(date, calories)
+        print(f"Logged {minutes} minutes of {activity} ({calories:.2f} calories burned) on {date}.")
+        return calories
+
+    def log_activities(self, entries, weight_kg):
+        """
+        Logs several activities in a single batched write.
+
+        Parameters:
+            entries (iterable): (date, activity, minutes) tuples.
+            weight_kg (float): Body weight in kilograms.
+
+        Returns:
+            float: Total calories burned across all entries.
+        """
+        # Compute everything up front so an unknown activity doesn't leave a partial write
+        daily_calories = defaultdict(float)
+        for date, activity, minutes in entries:
+            daily_calories[date] += calculate_activity_calories(activity, minutes, weight_kg)
+        self.data_storage.save_calories_burned_batch(sorted(daily_calories.items()))
+        total_calories = sum(daily_calories.values())
+        print(f"Logged {total_calories:.2f} calories burned across {len(daily_calories)} days.")
+        return total_calories
+
     def get_daily_activity(self, date):
         calories_burned = self.data_storage.get_calories_burned(date)
         if calories_burned:
             return calories_burned
         else:
-            return 0
\ No newline at end of file
+            return 0
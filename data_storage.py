@@ -1,16 +1,53 @@
 # data_storage.py
-# Author: Huy Vu    
+# Author: Huy Vu
 # Description: Manages data persistence using SQLite, including user profiles and logs.
 
 import sqlite3
 import json
-from datetime import date, datetime
-from user import UserProfile
-from utils import kg_to_lbs, cm_to_inches
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from storage_backend import StorageBackend, DEFAULT_RETENTION_DAYS, period_start, profile_to_dict, profile_from_dict
 
-class DataStorage:
-    def __init__(self):
-        self.conn = sqlite3.connect('dietmaster.db')
+# Change kinds whose values are added to the existing daily total; other kinds replace the value
+ADDITIVE_CHANGES = ('intake', 'burned')
+
+# Seeded changes sort before every real change in last-writer-wins comparisons
+SEED_TIMESTAMP = ''
+
+# Daily log table and value column for each metric
+METRIC_TABLES = {
+    'intake': ('calorie_intake_log', 'calories'),
+    'burned': ('activity_log', 'calories_burned'),
+    'weight': ('weight_log', 'weight')
+}
+
+# Aggregate table and SQLite expression mapping a date to the start of its period, per resolution
+ROLLUP_TABLES = {
+    'week': ('weekly_rollup', "date({column}, 'weekday 0', '-6 days')"),
+    'month': ('monthly_rollup', "date({column}, 'start of month')")
+}
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat()
+
+def seed_origin(kind, date_str):
+    return f"seed:{kind}:{date_str or ''}"
+
+def fold_origin(kind, date_str):
+    return f"fold:{kind}:{date_str}"
+
+def _seed_sort_key(kind, value):
+    # Deterministic winner between differing seeded values for the same row
+    if kind == 'profile':
+        return value
+    return json.loads(value)
+
+class DataStorage(StorageBackend):
+    supports_sync = True
+
+    def __init__(self, db_path='dietmaster.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
         self.create_tables()
 
     def create_tables(self):
@@ -43,69 +80,222 @@ class DataStorage:
                 weight REAL
             )
         ''')
+        # Weekly and monthly aggregates of compacted daily history
+        for table, _ in ROLLUP_TABLES.values():
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    period_start TEXT,
+                    metric TEXT,
+                    total REAL,
+                    count INTEGER,
+                    min REAL,
+                    max REAL,
+                    PRIMARY KEY (period_start, metric)
+                )
+            ''')
+        # Calories burned imported per source file and date, so re-imports only add the difference.
+        # Not synced: a file is expected to be imported on one database.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS imported_calories (
+                source TEXT,
+                date TEXT,
+                calories REAL,
+                PRIMARY KEY (source, date)
+            )
+        ''')
+        # Database settings, including the replica id used for sync
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        # Change log table: every write, identified by the replica it originated from
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT,
+                origin_seq INTEGER,
+                timestamp TEXT,
+                kind TEXT,
+                date TEXT,
+                value TEXT,
+                covers TEXT,
+                UNIQUE (origin, origin_seq)
+            )
+        ''')
+        cursor.execute('PRAGMA table_info(change_log)')
+        if 'covers' not in [row[1] for row in cursor.fetchall()]:
+            # Change logs created before compaction folded them
+            cursor.execute('ALTER TABLE change_log ADD COLUMN covers TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS change_log_kind_date ON change_log (kind, date)')
+        # Highest origin_seq of each origin whose superseded changes were deleted by compaction.
+        # A database receives an origin's changes in order, so anything up to it was received.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS folded_origins (
+                origin TEXT PRIMARY KEY,
+                origin_seq INTEGER
+            )
+        ''')
+        # Sync points: the last sequence of the peer's change log we received (pulled_seq) and of
+        # ours the peer received (pushed_seq), so entries every peer already has can be identified
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                peer_id TEXT PRIMARY KEY,
+                pulled_seq INTEGER,
+                pushed_seq INTEGER
+            )
+        ''')
+        cursor.execute("SELECT value FROM sync_meta WHERE key = 'replica_id'")
+        result = cursor.fetchone()
+        if result:
+            self.replica_id = result[0]
+        else:
+            self.replica_id = uuid.uuid4().hex
+            cursor.execute("INSERT INTO sync_meta (key, value) VALUES ('replica_id', ?)", (self.replica_id,))
+            self._seed_change_log(cursor)
         self.conn.commit()
 
-    def save_user_profile(self, user):
+    def _seed_change_log(self, cursor):
+        # Databases created before the change log existed: record their data so it can be synced.
+        # Copies of such a database seed the same rows, so seeded changes get an origin derived
+        # from the row they describe rather than from the replica; see _pull_changes.
+        changes = []
+        cursor.execute('SELECT data FROM user_profile')
+        for (data,) in cursor.fetchall():
+            changes.append(('profile', None, data))
+        cursor.execute('SELECT date, calories FROM calorie_intake_log')
+        changes.extend(('intake', row[0], json.dumps(row[1])) for row in cursor.fetchall())
+        cursor.execute('SELECT date, calories_burned FROM activity_log')
+        changes.extend(('burned', row[0], json.dumps(row[1])) for row in cursor.fetchall())
+        cursor.execute('SELECT date, weight FROM weight_log')
+        changes.extend(('weight', row[0], json.dumps(row[1])) for row in cursor.fetchall())
+        cursor.executemany('''
+            INSERT INTO change_log (origin, origin_seq, timestamp, kind, date, value) VALUES (?, 0, ?, ?, ?, ?)
+        ''', [(seed_origin(kind, date_str), SEED_TIMESTAMP, kind, date_str, value) for kind, date_str, value in changes])
+
+    def _record_changes(self, cursor, changes):
+        # changes: (kind, date string or None, JSON encoded value) tuples
+        timestamp = _utc_now()
+        rows = []
+        for kind, date_str, value in changes:
+            change_timestamp = timestamp
+            if kind not in ADDITIVE_CHANGES:
+                # A local write replaces what we have, so it must also win the last-writer-wins
+                # comparison on other databases, even against a change from a clock running ahead
+                cursor.execute('SELECT MAX(timestamp) FROM change_log WHERE kind = ? AND date IS ?', (kind, date_str))
+                latest = cursor.fetchone()[0]
+                if latest and latest >= change_timestamp:
+                    change_timestamp = (datetime.fromisoformat(latest) + timedelta(microseconds=1)).isoformat()
+            rows.append((self.replica_id, change_timestamp, kind, date_str, value))
+        cursor.executemany('''
+            INSERT INTO change_log (origin, timestamp, kind, date, value) VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.execute('UPDATE change_log SET origin_seq = seq WHERE origin = ? AND origin_seq IS NULL', (self.replica_id,))
+
+    def _apply_change(self, cursor, kind, date_str, value):
+        if kind == 'profile':
+            cursor.execute('DELETE FROM user_profile')
+            if value is not None:
+                cursor.execute('INSERT INTO user_profile (data) VALUES (?)', (json.dumps(value),))
+        elif kind == 'intake':
+            cursor.execute('''
+                INSERT INTO calorie_intake_log (date, calories) VALUES (?, ?)
+                ON CONFLICT(date) DO UPDATE SET calories = calories + excluded.calories
+            ''', (date_str, value))
+        elif kind == 'burned':
+            cursor.execute('''
+                INSERT INTO activity_log (date, calories_burned) VALUES (?, ?)
+                ON CONFLICT(date) DO UPDATE SET calories_burned = calories_burned + excluded.calories_burned
+            ''', (date_str, value))
+        elif kind == 'weight':
+            cursor.execute('''
+                INSERT INTO weight_log (date, weight) VALUES (?, ?)
+                ON CONFLICT(date) DO UPDATE SET weight = excluded.weight
+            ''', (date_str, value))
+        else:
+            raise ValueError(f"Unknown change kind: {kind}")
+
+    def _write_changes(self, cursor, changes):
+        # Records local changes; those for compacted dates update the aggregates instead of a daily row
+        compacted_before = self.get_setting('compacted_before')
+        compacted_changes = set()
+        for kind, date_str, value in changes:
+            if date_str is not None and compacted_before is not None and date_str < compacted_before:
+                compacted_changes.add((kind, date_str))
+            else:
+                self._apply_change(cursor, kind, date_str, value)
+        self._record_changes(cursor, [(kind, date_str, json.dumps(value)) for kind, date_str, value in changes])
+        if compacted_changes:
+            self._rebuild_rollups(cursor, compacted_changes, compacted_before, self.get_reset_seq())
+
+    def _save_change(self, kind, date_str, value):
         cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM user_profile')
-        # Convert date objects to strings
-        user_data = user.__dict__.copy()
-        if isinstance(user_data.get('start_date'), date):
-            user_data['start_date'] = user_data['start_date'].isoformat()
-        data = json.dumps(user_data)
-        cursor.execute('INSERT INTO user_profile (data) VALUES (?)', (data,))
+        self._write_changes(cursor, [(kind, date_str, value)])
         self.conn.commit()
 
-    def update_user_profile(self, user):
-        self.save_user_profile(user)
+    def apply_changes(self, changes, settings=None):
+        """
+        Applies and records several changes in a single transaction.
+
+        Parameters:
+            changes (list): (kind, date string or None, value) tuples, with kinds as in the change log.
+            settings (dict): Database settings to store in the same transaction.
+        """
+        cursor = self.conn.cursor()
+        self._write_changes(cursor, changes)
+        for key, value in (settings or {}).items():
+            self._set_setting(cursor, key, value)
+        self.conn.commit()
+
+    def get_setting(self, key):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT value FROM sync_meta WHERE key = ?', (key,))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        else:
+            return None
+
+    def _set_setting(self, cursor, key, value):
+        cursor.execute('''
+            INSERT INTO sync_meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+
+    def save_user_profile(self, user):
+        self._save_change('profile', None, profile_to_dict(user))
 
     def load_user_profile(self):
         cursor = self.conn.cursor()
         cursor.execute('SELECT data FROM user_profile')
         result = cursor.fetchone()
         if result:
-            data = json.loads(result[0])
-            user = UserProfile(
-                data['name'],
-                data['age'],
-                data['gender'],
-                data['height_cm'] if data['units'] == 'metric' else cm_to_inches(data['height_cm']),
-                data['weight_kg'] if data['units'] == 'metric' else kg_to_lbs(data['weight_kg']),
-                data['activity_level'],
-                data['units']
-            )
-            user.goal_weight_kg = data.get('goal_weight_kg')
-            user.weekly_weight_change = data.get('weekly_weight_change')
-            # Convert start_date back to date object
-            start_date_str = data.get('start_date')
-            if start_date_str:
-                user.start_date = datetime.fromisoformat(start_date_str).date()
-            else:
-                user.start_date = None
-            return user
+            return profile_from_dict(json.loads(result[0]))
         else:
             return None
 
     def delete_user_profile(self):
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM user_profile')
-        self.conn.commit()
+        self._save_change('profile', None, None)
 
     def clear_all_data(self):
+        # Resetting only affects this database. The change log is kept so sync points stay valid
+        # and changes received again from other databases are still recognised, but the changes
+        # up to the reset are superseded: they are no longer sent, rebuilt or compared against
         cursor = self.conn.cursor()
         cursor.execute('DELETE FROM user_profile')
         cursor.execute('DELETE FROM calorie_intake_log')
         cursor.execute('DELETE FROM activity_log')
         cursor.execute('DELETE FROM weight_log')
+        cursor.execute('DELETE FROM imported_calories')
+        for table, _ in ROLLUP_TABLES.values():
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute("DELETE FROM sync_meta WHERE key = 'compacted_before'")
+        self._set_setting(cursor, 'reset_seq', str(self.get_last_change_seq()))
         self.conn.commit()
 
     def save_calorie_intake(self, date, calories):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO calorie_intake_log (date, calories) VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET calories = calories + excluded.calories
-        ''', (date.isoformat(), calories))
-        self.conn.commit()
+        self._save_change('intake', date.isoformat(), calories)
 
     def get_calorie_intake(self, date):
         cursor = self.conn.cursor()
@@ -117,13 +307,42 @@ class DataStorage:
             return 0
 
     def save_calories_burned(self, date, calories):
+        self._save_change('burned', date.isoformat(), calories)
+
+    def save_calories_burned_batch(self, entries):
         cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO activity_log (date, calories_burned) VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET calories_burned = calories_burned + excluded.calories_burned
-        ''', (date.isoformat(), calories))
+        self._write_calories_burned_batch(cursor, entries)
         self.conn.commit()
 
+    def _write_calories_burned_batch(self, cursor, entries):
+        entries = [(date.isoformat(), calories) for date, calories in entries]
+        compacted_before = self.get_setting('compacted_before')
+        if compacted_before is not None and entries and min(entries)[0] < compacted_before:
+            self._write_changes(cursor, [('burned', date_str, calories) for date_str, calories in entries])
+        else:
+            cursor.executemany('''
+                INSERT INTO activity_log (date, calories_burned) VALUES (?, ?)
+                ON CONFLICT(date) DO UPDATE SET calories_burned = calories_burned + excluded.calories_burned
+            ''', entries)
+            self._record_changes(cursor, [('burned', date_str, json.dumps(calories)) for date_str, calories in entries])
+
+    def save_imported_calories(self, source, entries):
+        cursor = self.conn.cursor()
+        differences = []
+        for date, calories in entries:
+            cursor.execute('SELECT calories FROM imported_calories WHERE source = ? AND date = ?', (source, date.isoformat()))
+            result = cursor.fetchone()
+            previous = result[0] if result else 0
+            if calories != previous:
+                differences.append((date, calories - previous))
+        cursor.executemany('''
+            INSERT INTO imported_calories (source, date, calories) VALUES (?, ?, ?)
+            ON CONFLICT(source, date) DO UPDATE SET calories = excluded.calories
+        ''', [(source, date.isoformat(), calories) for date, calories in entries])
+        self._write_calories_burned_batch(cursor, differences)
+        self.conn.commit()
+        return differences
+
     def get_calories_burned(self, date):
         cursor = self.conn.cursor()
         cursor.execute('SELECT calories_burned FROM activity_log WHERE date = ?', (date.isoformat(),))
@@ -140,15 +359,521 @@ class DataStorage:
         return dates
 
     def save_weight_entry(self, date, weight):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO weight_log (date, weight) VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET weight = excluded.weight
-        ''', (date.isoformat(), weight))
-        self.conn.commit()
+        self._save_change('weight', date.isoformat(), weight)
 
     def get_weight_entries(self):
         cursor = self.conn.cursor()
         cursor.execute('SELECT date, weight FROM weight_log ORDER BY date')
         entries = cursor.fetchall()
-        return entries
\ No newline at end of file
+        return entries
+
+    def _get_compacted_weight(self, latest):
+        # Compacted weigh-ins are only kept in the change log, where the latest change of a date wins
+        compacted_before = self.get_setting('compacted_before')
+        if compacted_before is None:
+            return None
+        reset_seq = self.get_reset_seq()
+        order = 'DESC' if latest else 'ASC'
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT CAST(value AS REAL) FROM change_log AS c
+            WHERE kind = 'weight' AND date < ? AND seq > ? AND NOT EXISTS (
+                SELECT 1 FROM change_log AS n
+                WHERE n.kind = c.kind AND n.date = c.date AND n.seq > ?
+                AND (n.timestamp, n.origin, n.origin_seq) > (c.timestamp, c.origin, c.origin_seq)
+            )
+            ORDER BY date {order} LIMIT 1
+        ''', (compacted_before, reset_seq, reset_seq))
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        else:
+            return None
+
+    def get_first_weight(self):
+        first_weight = self._get_compacted_weight(latest=False)
+        if first_weight is not None:
+            return first_weight
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT weight FROM weight_log ORDER BY date LIMIT 1')
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        else:
+            return None
+
+    def get_latest_weight(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT weight FROM weight_log ORDER BY date DESC LIMIT 1')
+        result = cursor.fetchone()
+        if result:
+            return result[0]
+        else:
+            return self._get_compacted_weight(latest=True)
+
+    def get_last_change_seq(self):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT MAX(seq) FROM change_log')
+        result = cursor.fetchone()
+        return result[0] or 0
+
+    def get_reset_seq(self):
+        # Last change log sequence superseded by a reset
+        return int(self.get_setting('reset_seq') or 0)
+
+    def get_sync_point(self, peer_id):
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT pulled_seq, pushed_seq FROM sync_state WHERE peer_id = ?', (peer_id,))
+        result = cursor.fetchone()
+        if result:
+            return result
+        else:
+            return 0, 0
+
+    def _set_sync_point(self, peer_id, pulled_seq, pushed_seq):
+        cursor = self.conn.cursor()
+        cursor.execute('UPDATE sync_state SET pulled_seq = ?, pushed_seq = ? WHERE peer_id = ?', (pulled_seq, pushed_seq, peer_id))
+        self.conn.commit()
+
+    def get_peers_synced_seq(self):
+        """
+        Returns the last change log sequence every known peer has received, or None without peers.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT MIN(pushed_seq) FROM sync_state')
+        return cursor.fetchone()[0]
+
+    def _pull_changes(self, source):
+        """
+        Applies the changes recorded in another database since the last sync with it.
+
+        Intake and calories burned are increments, so they are applied once each in any order.
+        Profile and weight changes replace the value, and the latest change wins, ordered by
+        (timestamp, origin, origin_seq) so both databases pick the same winner.
+
+        Seeded changes describe the whole row at the time the change log was created, and copies
+        of a database seed the same origin. They are never added twice: when two seeds for a row
+        differ, both databases keep the larger value and adjust the row by the difference.
+
+        Changes superseded by a reset of either database are not applied again. Changes folded
+        by compaction are merged with the changes already received, see _merge_fold.
+
+        Parameters:
+            source (DataStorage): Database to read changes from.
+
+        Returns:
+            int: Number of changes applied.
+        """
+        pulled_seq, pushed_seq = self.get_sync_point(source.replica_id)
+        last_seq = source.get_last_change_seq()
+        reset_seq = self.get_reset_seq()
+        source_cursor = source.conn.cursor()
+        # Our own changes are skipped so they never echo back
+        source_cursor.execute('''
+            SELECT origin, origin_seq, timestamp, kind, date, value, covers FROM change_log
+            WHERE seq > ? AND seq <= ? AND origin != ?
+            ORDER BY seq
+        ''', (max(pulled_seq, source.get_reset_seq()), last_seq, self.replica_id))
+
+        compacted_before = self.get_compacted_before()
+        compacted_before = compacted_before.isoformat() if compacted_before else None
+        compacted_changes = set()
+        cursor = self.conn.cursor()
+        applied = 0
+        for origin, origin_seq, timestamp, kind, date_str, value, covers in source_cursor:
+            delta = None
+            if origin.startswith('fold:'):
+                delta = self._merge_fold(cursor, origin, kind, date_str, json.loads(covers), reset_seq)
+                if delta is None:
+                    continue
+            elif self._is_folded(cursor, origin, origin_seq, kind, date_str):
+                # Already received and folded by compaction
+                continue
+            else:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO change_log (origin, origin_seq, timestamp, kind, date, value)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (origin, origin_seq, timestamp, kind, date_str, value))
+            if delta is None and cursor.rowcount == 0:
+                if origin_seq != 0 or not origin.startswith('seed:'):
+                    # Already received, e.g. through a third database
+                    continue
+                cursor.execute('SELECT seq, value FROM change_log WHERE origin = ? AND origin_seq = 0', (origin,))
+                local_seq, local_value = cursor.fetchone()
+                if local_seq <= reset_seq or _seed_sort_key(kind, value) <= _seed_sort_key(kind, local_value):
+                    continue
+                # Re-insert so the replaced seed gets a new sequence and is passed on to other peers
+                cursor.execute('DELETE FROM change_log WHERE origin = ? AND origin_seq = 0', (origin,))
+                cursor.execute('''
+                    INSERT INTO change_log (origin, origin_seq, timestamp, kind, date, value)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (origin, origin_seq, timestamp, kind, date_str, value))
+                if kind in ADDITIVE_CHANGES:
+                    delta = json.loads(value) - json.loads(local_value)
+            if date_str is not None and compacted_before is not None and date_str < compacted_before:
+                # The daily row has been compacted; its aggregates are rebuilt from the change log
+                compacted_changes.add((kind, date_str))
+                applied += 1
+                continue
+            if kind not in ADDITIVE_CHANGES:
+                cursor.execute('''
+                    SELECT 1 FROM change_log
+                    WHERE kind = ? AND date IS ? AND seq > ? AND (timestamp, origin, origin_seq) > (?, ?, ?)
+                    LIMIT 1
+                ''', (kind, date_str, reset_seq, timestamp, origin, origin_seq))
+                if cursor.fetchone():
+                    continue
+            self._apply_change(cursor, kind, date_str, json.loads(value) if delta is None else delta)
+            applied += 1
+        if compacted_changes:
+            self._rebuild_rollups(cursor, compacted_changes, compacted_before, reset_seq)
+
+        cursor.execute('''
+            INSERT INTO sync_state (peer_id, pulled_seq, pushed_seq) VALUES (?, ?, ?)
+            ON CONFLICT(peer_id) DO UPDATE SET pulled_seq = excluded.pulled_seq
+        ''', (source.replica_id, last_seq, pushed_seq))
+        self.conn.commit()
+        return applied
+
+    def _known_origin_seq(self, cursor, origin):
+        # Every change of the origin up to this origin_seq was received
+        cursor.execute('SELECT MAX(origin_seq) FROM change_log WHERE origin = ?', (origin,))
+        known_seq = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT origin_seq FROM folded_origins WHERE origin = ?', (origin,))
+        folded = cursor.fetchone()
+        return max(known_seq, folded[0]) if folded else known_seq
+
+    def _is_folded(self, cursor, origin, origin_seq, kind, date_str):
+        cursor.execute('SELECT origin_seq FROM folded_origins WHERE origin = ?', (origin,))
+        folded = cursor.fetchone()
+        if folded and origin_seq <= folded[0]:
+            return True
+        cursor.execute('SELECT covers FROM change_log WHERE origin = ? AND origin_seq = 0', (fold_origin(kind, date_str),))
+        fold = cursor.fetchone()
+        return fold is not None and origin_seq <= json.loads(fold[0]).get(origin, [0, 0])[0]
+
+    def _merge_fold(self, cursor, origin, kind, date_str, covers, reset_seq):
+        """
+        Merges a folded change received from another database into the change log.
+
+        A fold covers, per origin, that origin's changes to the row up to an origin_seq, together
+        with their total. Every database receives an origin's changes in order, so of two folds
+        the one reaching further covers everything the other does for that origin, and the
+        changes it covers can be replaced by it without counting anything twice.
+
+        Parameters:
+            cursor (sqlite3.Cursor): Cursor of the open transaction.
+            origin (str): Origin of the folded change, see fold_origin.
+            kind (str): 'intake' or 'burned'.
+            date_str (str): ISO date of the row.
+            covers (dict): [origin_seq, total] pairs keyed by origin.
+            reset_seq (int): Last change log sequence superseded by a reset.
+
+        Returns:
+            float: Change of the daily value, or None if the fold holds nothing new.
+        """
+        cursor.execute('SELECT seq, value, covers FROM change_log WHERE origin = ? AND origin_seq = 0', (origin,))
+        local = cursor.fetchone()
+        merged = json.loads(local[2]) if local else {}
+        if all(seq <= max(merged.get(covered, [0, 0])[0], self._known_origin_seq(cursor, covered))
+               for covered, (seq, _) in covers.items()):
+            return None
+        old_total = json.loads(local[1]) if local and local[0] > reset_seq else 0
+        for covered, (seq, total) in covers.items():
+            if seq > merged.get(covered, [0, 0])[0]:
+                merged[covered] = [seq, total]
+
+        # The fold replaces the changes it now covers
+        cursor.execute('''
+            SELECT seq, origin, origin_seq, value FROM change_log
+            WHERE kind = ? AND date = ? AND origin NOT LIKE 'seed:%' AND origin NOT LIKE 'fold:%'
+        ''', (kind, date_str))
+        covered_seqs = []
+        for seq, change_origin, change_origin_seq, value in cursor.fetchall():
+            if change_origin_seq <= merged.get(change_origin, [0, 0])[0]:
+                covered_seqs.append((seq,))
+                if seq > reset_seq:
+                    old_total += json.loads(value)
+        cursor.executemany('DELETE FROM change_log WHERE seq = ?', covered_seqs)
+        cursor.execute('DELETE FROM change_log WHERE origin = ? AND origin_seq = 0', (origin,))
+        new_total = sum(total for _, total in merged.values())
+        cursor.execute('''
+            INSERT INTO change_log (origin, origin_seq, timestamp, kind, date, value, covers)
+            VALUES (?, 0, ?, ?, ?, ?, ?)
+        ''', (origin, SEED_TIMESTAMP, kind, date_str, json.dumps(new_total), json.dumps(merged)))
+        return new_total - old_total
+
+    def _rebuild_rollups(self, cursor, changes, compacted_before, reset_seq):
+        """
+        Recomputes the aggregates of the compacted periods containing the given changes.
+
+        Daily values are derived from the change log: intake and calories burned are the sum of
+        their changes, weight is the latest change. Only dates before the compaction cutoff are
+        included, as later dates are still kept as daily rows, and changes superseded by a reset
+        are left out.
+
+        Parameters:
+            cursor (sqlite3.Cursor): Cursor of the open transaction.
+            changes (set): (kind, date string) pairs of the changes received.
+            compacted_before (str): ISO date of the compaction cutoff.
+            reset_seq (int): Last change log sequence superseded by a reset.
+        """
+        periods = set()
+        for kind, date_str in changes:
+            for resolution in ROLLUP_TABLES:
+                periods.add((kind, resolution, period_start(date.fromisoformat(date_str), resolution)))
+        for metric, resolution, start in periods:
+            if resolution == 'week':
+                end = start + timedelta(days=7)
+            else:
+                end = (start + timedelta(days=32)).replace(day=1)
+            range_args = (metric, start.isoformat(), min(end.isoformat(), compacted_before), reset_seq)
+            if metric in ADDITIVE_CHANGES:
+                daily_query = '''
+                    SELECT date AS day, SUM(CAST(value AS REAL)) AS day_value FROM change_log
+                    WHERE kind = ? AND date >= ? AND date < ? AND seq > ? GROUP BY date
+                '''
+            else:
+                daily_query = '''
+                    SELECT date AS day, CAST(value AS REAL) AS day_value FROM change_log AS c
+                    WHERE kind = ? AND date >= ? AND date < ? AND seq > ? AND NOT EXISTS (
+                        SELECT 1 FROM change_log AS n
+                        WHERE n.kind = c.kind AND n.date = c.date AND n.seq > ?
+                        AND (n.timestamp, n.origin, n.origin_seq) > (c.timestamp, c.origin, c.origin_seq)
+                    )
+                '''
+                range_args += (reset_seq,)
+            rollup_table, _ = ROLLUP_TABLES[resolution]
+            cursor.execute(f'DELETE FROM {rollup_table} WHERE period_start = ? AND metric = ?', (start.isoformat(), metric))
+            cursor.execute(f'''
+                INSERT INTO {rollup_table} (period_start, metric, total, count, min, max)
+                SELECT ?, ?, SUM(day_value), COUNT(day_value), MIN(day_value), MAX(day_value)
+                FROM ({daily_query}) HAVING COUNT(day_value) > 0
+            ''', (start.isoformat(), metric) + range_args)
+
+    def sync_with(self, db_path):
+        """
+        Exchanges the changes made since the last sync with another database file.
+
+        Only change log entries past the stored sync points are read, so repeated syncs
+        transfer just the new writes. Resetting data is local and is not synced, but the changes
+        made before the reset are no longer sent to any database. Weekly and
+        monthly aggregates are not synced either: the other database receives the daily
+        changes behind them and keeps them as daily history until it is compacted itself.
+
+        Parameters:
+            db_path (str): Path to the other DietMaster database.
+
+        Returns:
+            tuple: (changes pulled into this database, changes pushed to the other database).
+        """
+        other = DataStorage(db_path)
+        try:
+            if other.replica_id == self.replica_id:
+                raise ValueError("Cannot sync a database with itself or a copy of it. If it is a copy, set it up as a new copy first.")
+            pulled = self._pull_changes(other)
+            pushed = other._pull_changes(self)
+            # Everything the other database just received came from us, so we have its whole change
+            # log. Both databases remember how far the other has caught up with theirs.
+            other_pulled_seq = other.get_sync_point(self.replica_id)[0]
+            self._set_sync_point(other.replica_id, other.get_last_change_seq(), other_pulled_seq)
+            other._set_sync_point(self.replica_id, other_pulled_seq, other.get_last_change_seq())
+        finally:
+            other.close()
+        return pulled, pushed
+
+    def assign_new_replica_id(self):
+        """
+        Gives this database a new replica id, so a copy of a database file can be synced with the original.
+
+        Changes already in the change log keep their origin, so both databases recognise them
+        as the same changes; only changes made from now on are recorded under the new id.
+        This should be done right after copying, as changes made on the copy before are
+        recorded under the same id as the original's.
+        """
+        self.replica_id = uuid.uuid4().hex
+        cursor = self.conn.cursor()
+        self._set_setting(cursor, 'replica_id', self.replica_id)
+        self.conn.commit()
+
+    def get_compacted_before(self):
+        compacted_before = self.get_setting('compacted_before')
+        if compacted_before:
+            return date.fromisoformat(compacted_before)
+        else:
+            return None
+
+    def compact_history(self, retention_days=DEFAULT_RETENTION_DAYS, today=None):
+        """
+        Rolls daily history older than the retention horizon into weekly and monthly aggregates.
+
+        Aggregates keep the sum, count, min and max of each period, so periods split across
+        several compactions are merged. Compacted daily rows are deleted and the database file
+        is vacuumed.
+
+        Aggregates are not synced. The change log is kept instead, so a database synced later
+        still receives the daily history, and changes that arrive later for compacted dates are
+        merged into the aggregates. The entries for compacted dates that every known peer has
+        received are folded, see _fold_change_log.
+
+        Parameters:
+            retention_days (int): Number of days of daily history to keep.
+            today (date): Reference date, defaults to today.
+
+        Returns:
+            int: Number of daily rows compacted.
+        """
+        if today is None:
+            today = date.today()
+        cutoff = (today - timedelta(days=retention_days)).isoformat()
+        cursor = self.conn.cursor()
+        compacted = 0
+        for metric, (table, column) in METRIC_TABLES.items():
+            for rollup_table, period_expression in ROLLUP_TABLES.values():
+                period = period_expression.format(column='date')
+                cursor.execute(f'''
+                    INSERT INTO {rollup_table} (period_start, metric, total, count, min, max)
+                    SELECT {period}, ?, SUM({column}), COUNT({column}), MIN({column}), MAX({column})
+                    FROM {table} WHERE date < ? GROUP BY {period}
+                    ON CONFLICT(period_start, metric) DO UPDATE SET
+                        total = total + excluded.total,
+                        count = count + excluded.count,
+                        min = MIN(min, excluded.min),
+                        max = MAX(max, excluded.max)
+                ''', (metric, cutoff))
+            cursor.execute(f'DELETE FROM {table} WHERE date < ?', (cutoff,))
+            compacted += cursor.rowcount
+
+        compacted_before = self.get_compacted_before()
+        if compacted_before is None or compacted_before.isoformat() < cutoff:
+            self._set_setting(cursor, 'compacted_before', cutoff)
+        else:
+            cutoff = compacted_before.isoformat()
+        synced_seq = self.get_peers_synced_seq()
+        if synced_seq is None:
+            synced_seq = self.get_last_change_seq()
+        self._fold_change_log(cursor, cutoff, synced_seq, self.get_reset_seq())
+        self.conn.commit()
+        self.conn.execute('VACUUM')
+        return compacted
+
+    def _fold_change_log(self, cursor, compacted_before, synced_seq, reset_seq):
+        """
+        Shrinks the change log entries for compacted dates that every known peer has received.
+
+        The intake or calories burned changes of a date are folded into a single change holding
+        their total, which records what it covers (see _merge_fold) and keeps the sequence of the
+        last change folded, so peers that received the originals are not sent it. Weight and
+        profile changes that lost to a later change are deleted, as are changes superseded by a
+        reset; the highest origin_seq deleted per origin is kept, so the same changes forwarded
+        by another database are ignored. Seeded changes are kept as they are.
+
+        Parameters:
+            cursor (sqlite3.Cursor): Cursor of the open transaction.
+            compacted_before (str): ISO date of the compaction cutoff.
+            synced_seq (int): Last change log sequence every known peer has received.
+            reset_seq (int): Last change log sequence superseded by a reset.
+        """
+        additive_kinds = ', '.join('?' * len(ADDITIVE_CHANGES))
+        foldable = "(date < ? OR kind = 'profile') AND seq <= ? AND origin NOT LIKE 'seed:%'"
+        foldable_args = (compacted_before, synced_seq)
+        superseded = f'''
+            SELECT seq FROM change_log AS c WHERE {foldable} AND (
+                seq <= ? OR (kind NOT IN ({additive_kinds}) AND EXISTS (
+                    SELECT 1 FROM change_log AS n
+                    WHERE n.kind = c.kind AND n.date IS c.date AND n.seq > ?
+                    AND (n.timestamp, n.origin, n.origin_seq) > (c.timestamp, c.origin, c.origin_seq)
+                ))
+            )
+        '''
+        superseded_args = foldable_args + (reset_seq,) + ADDITIVE_CHANGES + (reset_seq,)
+        cursor.execute(f'''
+            INSERT INTO folded_origins (origin, origin_seq)
+            SELECT origin, MAX(origin_seq) FROM change_log
+            WHERE seq IN ({superseded}) AND origin NOT LIKE 'fold:%' GROUP BY origin
+            ON CONFLICT(origin) DO UPDATE SET origin_seq = MAX(origin_seq, excluded.origin_seq)
+        ''', superseded_args)
+        cursor.execute(f'DELETE FROM change_log WHERE seq IN ({superseded})', superseded_args)
+
+        cursor.execute(f'''
+            SELECT kind, date FROM change_log
+            WHERE kind IN ({additive_kinds}) AND {foldable} AND seq > ?
+            GROUP BY kind, date HAVING COUNT(*) > 1
+        ''', ADDITIVE_CHANGES + foldable_args + (reset_seq,))
+        for kind, date_str in cursor.fetchall():
+            origin = fold_origin(kind, date_str)
+            cursor.execute('SELECT seq FROM change_log WHERE origin = ? AND origin_seq = 0', (origin,))
+            fold = cursor.fetchone()
+            if fold and not reset_seq < fold[0] <= synced_seq:
+                # A fold not yet sent to every peer; merged by a later compaction
+                continue
+            # The previous fold first: the changes after it extend what it covers
+            cursor.execute('''
+                SELECT seq, origin, origin_seq, value, covers FROM change_log
+                WHERE kind = ? AND date = ? AND seq <= ? AND seq > ? AND origin NOT LIKE 'seed:%'
+                ORDER BY covers IS NULL, seq
+            ''', (kind, date_str, synced_seq, reset_seq))
+            rows = cursor.fetchall()
+            covers = {}
+            for _, change_origin, change_origin_seq, value, change_covers in rows:
+                if change_covers:
+                    covers = json.loads(change_covers)
+                    continue
+                covered_seq, covered_total = covers.get(change_origin, [0, 0])
+                covers[change_origin] = [max(covered_seq, change_origin_seq), covered_total + json.loads(value)]
+            cursor.executemany('DELETE FROM change_log WHERE seq = ?', [(row[0],) for row in rows])
+            cursor.execute('''
+                INSERT INTO change_log (seq, origin, origin_seq, timestamp, kind, date, value, covers)
+                VALUES (?, ?, 0, ?, ?, ?, ?, ?)
+            ''', (max(row[0] for row in rows), origin, SEED_TIMESTAMP, kind, date_str,
+                  json.dumps(sum(json.loads(row[3]) for row in rows)), json.dumps(covers)))
+
+    def get_date_range(self):
+        cursor = self.conn.cursor()
+        queries = [f'SELECT MIN(date) AS first_date, MAX(date) AS last_date FROM {table}' for table, _ in METRIC_TABLES.values()]
+        queries += [f'SELECT MIN(period_start), MAX(period_start) FROM {table}' for table, _ in ROLLUP_TABLES.values()]
+        cursor.execute(f'SELECT MIN(first_date), MAX(last_date) FROM ({" UNION ALL ".join(queries)})')
+        first, last = cursor.fetchone()
+        if first is None:
+            return None, None
+        return date.fromisoformat(first), date.fromisoformat(last)
+
+    def get_daily_values(self, metric, start_date, end_date):
+        table, column = METRIC_TABLES[metric]
+        cursor = self.conn.cursor()
+        cursor.execute(f'SELECT date, {column} FROM {table} WHERE date BETWEEN ? AND ? ORDER BY date',
+                       (start_date.isoformat(), end_date.isoformat()))
+        return cursor.fetchall()
+
+    def get_history(self, metric, start_date, end_date, resolution=None):
+        # Same result as StorageBackend.get_history, with compacted periods read from the rollup tables
+        if resolution is None:
+            resolution = self.choose_resolution(start_date, end_date)
+        table, column = METRIC_TABLES[metric]
+        cursor = self.conn.cursor()
+        if resolution == 'day':
+            cursor.execute(f'''
+                SELECT date, {column}, {column}, {column}, {column}, 1 FROM {table}
+                WHERE date BETWEEN ? AND ? ORDER BY date
+            ''', (start_date.isoformat(), end_date.isoformat()))
+            return cursor.fetchall()
+
+        rollup_table, period_expression = ROLLUP_TABLES[resolution]
+        period = period_expression.format(column='date')
+        range_start = period_start(start_date, resolution).isoformat()
+        range_end = end_date.isoformat()
+        # Compacted periods come from the rollup table, recent ones are aggregated from daily rows
+        cursor.execute(f'''
+            SELECT period_start, SUM(total), SUM(total) / SUM(count), MIN(min), MAX(max), SUM(count) FROM (
+                SELECT period_start, total, count, min, max FROM {rollup_table}
+                WHERE metric = ? AND period_start BETWEEN ? AND ?
+                UNION ALL
+                SELECT {period}, SUM({column}), COUNT({column}), MIN({column}), MAX({column}) FROM {table}
+                WHERE date BETWEEN ? AND ? GROUP BY {period}
+            )
+            GROUP BY period_start ORDER BY period_start
+        ''', (metric, range_start, range_end, range_start, range_end))
+        return cursor.fetchall()
+
+    def close(self):
+        self.conn.close()
@@ -3,17 +3,49 @@
 # Description: Main script and entry point of the DietMaster application.
 
 from user import UserProfile
-from activity import ActivityLog
+from activity import ActivityLog, ACTIVITY_METS
 from nutrition import CalorieIntakeLog
 from report import generate_pdf_report
 from data_storage import DataStorage
-from utils import get_float_input, get_int_input, get_choice_input, kg_to_lbs, cm_to_inches, lbs_to_kg, get_date_input
+from memory_storage import InMemoryStorage
+from journal_storage import JournalStorage
+from storage_backend import DEFAULT_RETENTION_DAYS
+from wearable_import import import_wearable_files
+from utils import get_float_input, get_int_input, get_choice_input, kg_to_lbs, cm_to_inches, lbs_to_kg, get_date_input, get_activity_entries_input
 import datetime
+import os
+import sqlite3
 
-def main():
+def create_data_storage(backend=None, db_path=None):
+    """
+    Creates the storage backend, selected by the DIETMASTER_STORAGE and DIETMASTER_DB environment
+    variables unless given.
+
+    Parameters:
+        backend (str): 'sqlite' (default), 'memory' or 'journal'.
+        db_path (str): Path to the SQLite database, defaults to dietmaster.db.
+
+    Returns:
+        StorageBackend: The storage backend.
+    """
+    if backend is None:
+        backend = os.environ.get('DIETMASTER_STORAGE', 'sqlite')
+    if db_path is None:
+        db_path = os.environ.get('DIETMASTER_DB', 'dietmaster.db')
+    if backend == 'sqlite':
+        return DataStorage(db_path)
+    elif backend == 'memory':
+        return InMemoryStorage()
+    elif backend == 'journal':
+        return JournalStorage(os.path.splitext(db_path)[0] + '.journal', db_path)
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+def main(data_storage=None):
     # Create or load user profile
     print("Welcome to DietMaster!")
-    data_storage = DataStorage()
+    if data_storage is None:
+        data_storage = create_data_storage()
     user = data_storage.load_user_profile()
 
     if user:
@@ -83,17 +115,32 @@ def main():
         print("6. Check days to reach goal")
         print("7. Update personal information")
         print("8. Reset all data")
-        print("9. Exit")
-        choice = get_choice_input("Enter your choice", [str(i) for i in range(1, 10)])
+        print("9. Manage data")
+        print("10. Exit")
+        choice = get_choice_input("Enter your choice", [str(i) for i in range(1, 11)])
 
         if choice == '1':
             date = get_date_input("Enter date (YYYY-MM-DD) or press Enter for today: ", allow_blank=True)
             calories = get_float_input("Enter total calories intake", example=2000)
             calorie_intake_log.log_calories_intake(date, calories)
         elif choice == '2':
-            date = get_date_input("Enter date (YYYY-MM-DD) or press Enter for today: ", allow_blank=True)
-            calories = get_float_input("Enter total calories burned", example=500)
-            activity_log.log_calories_burned(date, calories)
+            method = get_choice_input("Log by total calories, a single activity, or several activities at once", ['calories', 'activity', 'bulk'])
+            if method == 'calories':
+                date = get_date_input("Enter date (YYYY-MM-DD) or press Enter for today: ", allow_blank=True)
+                calories = get_float_input("Enter total calories burned", example=500)
+                activity_log.log_calories_burned(date, calories)
+            elif method == 'activity':
+                date = get_date_input("Enter date (YYYY-MM-DD) or press Enter for today: ", allow_blank=True)
+                activity = get_choice_input("Enter the activity", list(ACTIVITY_METS))
+                minutes = get_float_input("Enter the duration in minutes", example=30, unit='min')
+                while minutes <= 0:
+                    print("The duration must be greater than zero minutes.")
+                    minutes = get_float_input("Enter the duration in minutes", example=30, unit='min')
+                activity_log.log_activity(date, activity, minutes, get_current_weight(user, data_storage))
+            else:
+                print(f"Available activities: {', '.join(ACTIVITY_METS)}")
+                entries = get_activity_entries_input("Enter activities as YYYY-MM-DD,activity,minutes separated by ';' (e.g., 2024-01-01,running,30; 2024-01-02,yoga,45): ", ACTIVITY_METS)
+                activity_log.log_activities(entries, get_current_weight(user, data_storage))
         elif choice == '3':
             date = get_date_input("Enter date (YYYY-MM-DD) or press Enter for today: ", allow_blank=True)
             if user.units == 'imperial':
@@ -132,12 +179,7 @@ def main():
         elif choice == '5':
             generate_pdf_report(calorie_intake_log, activity_log, user)
         elif choice == '6':
-            # Get the latest weight entry
-            weight_entries = data_storage.get_weight_entries()
-            if weight_entries:
-                latest_weight = weight_entries[-1][1]
-            else:
-                latest_weight = user.weight_kg
+            latest_weight = get_current_weight(user, data_storage)
             days_to_goal = user.days_to_goal(current_weight=latest_weight)
             if days_to_goal > 0:
                 estimated_goal_date = datetime.date.today() + datetime.timedelta(days=days_to_goal)
@@ -153,14 +195,25 @@ def main():
             if confirm == 'yes':
                 data_storage.clear_all_data()
                 print("All data has been reset. Restarting the application.")
-                main()
+                main(data_storage)
                 return
             else:
                 print("Data reset canceled.")
         elif choice == '9':
+            manage_data(user, data_storage)
+        elif choice == '10':
             print("Exiting DietMaster. Goodbye!")
             break
 
+    data_storage.close()
+
+def get_current_weight(user, data_storage):
+    # Use the latest weight entry, falling back to the profile weight
+    latest_weight = data_storage.get_latest_weight()
+    if latest_weight is not None:
+        return latest_weight
+    return user.weight_kg
+
 def set_goal_weight(user, data_storage):
     # Ask for user's goal weight
     if user.units == 'imperial':
@@ -227,5 +280,80 @@ def update_user_info(user, data_storage):
     else:
         print("Invalid choice.")
 
+def manage_data(user, data_storage):
+    # Sync is only offered by storages that support it
+    options = ['Import wearable data (CSV or GPX)']
+    if data_storage.supports_sync:
+        options += ['Sync with another database', 'Set up this database as a new copy']
+    options += ['Compact old history', 'Cancel']
+    print("\nManage Data:")
+    for number, option in enumerate(options, 1):
+        print(f"{number}. {option}")
+    choice = get_choice_input("Enter your choice", [str(number) for number in range(1, len(options) + 1)])
+    option = options[int(choice) - 1]
+
+    if option == 'Import wearable data (CSV or GPX)':
+        import_wearable_data(user, data_storage)
+    elif option == 'Sync with another database':
+        sync_database(data_storage)
+    elif option == 'Set up this database as a new copy':
+        set_up_new_copy(data_storage)
+    elif option == 'Compact old history':
+        compact_history(data_storage)
+    else:
+        print("Canceled.")
+
+def import_wearable_data(user, data_storage):
+    paths_str = input("Enter the export file paths separated by commas (e.g., heart_rate.csv, run.gpx): ")
+    paths = [path.strip() for path in paths_str.split(',') if path.strip()]
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if not paths or missing:
+        print(f"File not found: {', '.join(missing)}" if missing else "No files entered.")
+        return
+    workers = 1
+    if len(paths) > 1:
+        workers = get_int_input("Enter the number of files to process in parallel", example=min(len(paths), os.cpu_count() or 1))
+    try:
+        daily_calories = import_wearable_files(paths, data_storage, user, get_current_weight(user, data_storage), workers=workers)
+    except (ValueError, OSError) as e:
+        print(f"Import failed: {e}")
+        return
+    total_calories = sum(daily_calories.values())
+    print(f"Imported {total_calories:.2f} calories burned across {len(daily_calories)} days.")
+
+def sync_database(data_storage):
+    db_path = input("Enter the path of the database to sync with (e.g., /mnt/server/dietmaster.db): ").strip()
+    if not os.path.isfile(db_path):
+        confirm = input(f"{db_path} does not exist. Create it as a new copy of your data? (yes/no): ").lower()
+        if confirm != 'yes':
+            print("Sync canceled.")
+            return
+    try:
+        pulled, pushed = data_storage.sync_with(db_path)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Sync failed: {e}")
+        return
+    print(f"Sync complete: received {pulled} changes and sent {pushed} changes.")
+    if pulled:
+        print("Restart DietMaster to load any profile changes received.")
+
+def set_up_new_copy(data_storage):
+    print("Use this after copying your database file to another machine, before logging anything on the copy.")
+    confirm = input("Give this database a new identity so it can be synced with the original? (yes/no): ").lower()
+    if confirm != 'yes':
+        print("Canceled.")
+        return
+    data_storage.assign_new_replica_id()
+    print("This database can now be synced with the original.")
+
+def compact_history(data_storage):
+    print("Daily entries older than the retention period are replaced by weekly and monthly summaries.")
+    retention_days = get_int_input("Enter the number of days of daily history to keep", example=DEFAULT_RETENTION_DAYS)
+    if retention_days < 0:
+        print("The retention period cannot be negative.")
+        return
+    compacted = data_storage.compact_history(retention_days)
+    print(f"Compacted {compacted} daily entries older than {retention_days} days.")
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
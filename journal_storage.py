@@ -0,0 +1,195 @@
+# journal_storage.py
+# Author: Huy Vu
+# Description: Append-only journal storage backend with periodic compaction into SQLite.
+
+import json
+import os
+from data_storage import DataStorage
+from storage_backend import StorageBackend, DEFAULT_RETENTION_DAYS, profile_to_dict, profile_from_dict
+
+# Number of journal entries written before they are compacted into the SQLite database
+DEFAULT_COMPACT_EVERY = 1000
+
+class JournalStorage(StorageBackend):
+    """
+    Storage that appends every write to a journal file and periodically compacts it into SQLite.
+
+    A write is a single appended line, so logging is much cheaper than a SQLite transaction.
+    Reads combine the SQLite database with the changes still in the journal. The journal is
+    flushed after each write but not fsynced: a crash of the program loses nothing, a power
+    failure may lose the most recent entries. Leftover entries are compacted on startup.
+
+    Each journal starts with a generation number, which is stored in SQLite in the same
+    transaction that applies its entries. A journal whose generation was already applied, e.g.
+    after a crash before it was truncated, is discarded instead of being applied twice.
+    """
+
+    supports_sync = True
+
+    def __init__(self, journal_path='dietmaster.journal', db_path='dietmaster.db', compact_every=DEFAULT_COMPACT_EVERY):
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.storage = DataStorage(db_path)
+        self.journal = None
+        self._reset_pending()
+        self.compact()
+        self.journal = open(journal_path, 'a')
+
+    def _reset_pending(self):
+        # Changes written to the journal but not yet compacted into SQLite
+        self.pending_count = 0
+        self.pending_profile = None
+        self.has_pending_profile = False
+        self.pending_logs = {
+            'intake': {},
+            'burned': {},
+            'weight': {}
+        }
+
+    def _read_journal(self):
+        # Returns the journal generation (None without a header) and its entries
+        generation = None
+        changes = []
+        if not os.path.exists(self.journal_path):
+            return generation, changes
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A partially written last line from an interrupted session
+                    continue
+                if 'generation' in entry:
+                    generation = entry['generation']
+                else:
+                    changes.append((entry['kind'], entry['date'], entry['value']))
+        return generation, changes
+
+    def _applied_generation(self):
+        return int(self.storage.get_setting('journal_generation') or 0)
+
+    def _start_journal(self):
+        # Truncates the journal and starts the generation after the last applied one
+        with open(self.journal_path, 'w') as f:
+            f.write(json.dumps({'generation': self._applied_generation() + 1}) + '\n')
+
+    def compact(self):
+        """
+        Moves the journal entries into the SQLite database in one transaction and truncates the journal.
+        """
+        if self.journal is not None:
+            self.journal.flush()
+        generation, changes = self._read_journal()
+        if generation is None:
+            generation = self._applied_generation() + 1
+        if changes and generation > self._applied_generation():
+            self.storage.apply_changes(changes, {'journal_generation': str(generation)})
+        self._start_journal()
+        self._reset_pending()
+
+    def _append(self, changes):
+        for kind, date_str, value in changes:
+            self.journal.write(json.dumps({'kind': kind, 'date': date_str, 'value': value}) + '\n')
+            if kind == 'profile':
+                self.pending_profile = value
+                self.has_pending_profile = True
+            elif kind == 'weight':
+                self.pending_logs[kind][date_str] = value
+            else:
+                self.pending_logs[kind][date_str] = self.pending_logs[kind].get(date_str, 0) + value
+        self.journal.flush()
+        self.pending_count += len(changes)
+        if self.pending_count >= self.compact_every:
+            self.compact()
+
+    def save_user_profile(self, user):
+        self._append([('profile', None, profile_to_dict(user))])
+
+    def load_user_profile(self):
+        if not self.has_pending_profile:
+            return self.storage.load_user_profile()
+        if self.pending_profile:
+            return profile_from_dict(self.pending_profile)
+        else:
+            return None
+
+    def delete_user_profile(self):
+        self._append([('profile', None, None)])
+
+    def clear_all_data(self):
+        # Pending entries are discarded along with the rest of the data
+        self.journal.flush()
+        self._start_journal()
+        self._reset_pending()
+        self.storage.clear_all_data()
+
+    def save_calorie_intake(self, date, calories):
+        self._append([('intake', date.isoformat(), calories)])
+
+    def get_calorie_intake(self, date):
+        return self.storage.get_calorie_intake(date) + self.pending_logs['intake'].get(date.isoformat(), 0)
+
+    def save_calories_burned(self, date, calories):
+        self._append([('burned', date.isoformat(), calories)])
+
+    def save_calories_burned_batch(self, entries):
+        self._append([('burned', date.isoformat(), calories) for date, calories in entries])
+
+    def save_imported_calories(self, source, entries):
+        # Compares against the imported totals in SQLite, so pending entries are applied first
+        self.compact()
+        return self.storage.save_imported_calories(source, entries)
+
+    def get_calories_burned(self, date):
+        return self.storage.get_calories_burned(date) + self.pending_logs['burned'].get(date.isoformat(), 0)
+
+    def get_all_dates(self):
+        return sorted(set(self.storage.get_all_dates()).union(*self.pending_logs.values()))
+
+    def save_weight_entry(self, date, weight):
+        self._append([('weight', date.isoformat(), weight)])
+
+    def get_weight_entries(self):
+        weight_entries = dict(self.storage.get_weight_entries())
+        weight_entries.update(self.pending_logs['weight'])
+        return sorted(weight_entries.items())
+
+    def get_first_weight(self):
+        self.compact()
+        return self.storage.get_first_weight()
+
+    def get_latest_weight(self):
+        self.compact()
+        return self.storage.get_latest_weight()
+
+    def get_daily_values(self, metric, start_date, end_date):
+        self.compact()
+        return self.storage.get_daily_values(metric, start_date, end_date)
+
+    def get_date_range(self):
+        self.compact()
+        return self.storage.get_date_range()
+
+    def get_compacted_before(self):
+        return self.storage.get_compacted_before()
+
+    def get_history(self, metric, start_date, end_date, resolution=None):
+        self.compact()
+        return self.storage.get_history(metric, start_date, end_date, resolution)
+
+    def compact_history(self, retention_days=DEFAULT_RETENTION_DAYS, today=None):
+        self.compact()
+        return self.storage.compact_history(retention_days, today)
+
+    def sync_with(self, db_path):
+        self.compact()
+        return self.storage.sync_with(db_path)
+
+    def assign_new_replica_id(self):
+        self.compact()
+        self.storage.assign_new_replica_id()
+
+    def close(self):
+        self.compact()
+        self.journal.close()
+        self.storage.close()
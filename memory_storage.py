@@ -0,0 +1,155 @@
+# memory_storage.py
+# Author: Huy Vu
+# Description: In-memory storage backend for tests and benchmarks; nothing is written to disk.
+
+from datetime import date, timedelta
+from storage_backend import StorageBackend, DEFAULT_RETENTION_DAYS, period_start, profile_to_dict, profile_from_dict
+
+class InMemoryStorage(StorageBackend):
+    def __init__(self):
+        self.profile = None
+        # Daily logs keyed by ISO date string, as in the SQLite tables
+        self.logs = {
+            'intake': {},
+            'burned': {},
+            'weight': {}
+        }
+        # Aggregates of compacted daily history: [total, count, min, max] keyed by (period_start, metric)
+        self.rollups = {
+            'week': {},
+            'month': {}
+        }
+        self.compacted_before = None
+        # Calories imported per (source, ISO date string)
+        self.imported_calories = {}
+        # First and last compacted weigh-ins as (date, weight); the rollups only keep period aggregates
+        self.compacted_weights = []
+
+    def save_user_profile(self, user):
+        self.profile = profile_to_dict(user)
+
+    def load_user_profile(self):
+        if self.profile:
+            return profile_from_dict(self.profile)
+        else:
+            return None
+
+    def delete_user_profile(self):
+        self.profile = None
+
+    def clear_all_data(self):
+        self.profile = None
+        for log in self.logs.values():
+            log.clear()
+        for rollup in self.rollups.values():
+            rollup.clear()
+        self.compacted_before = None
+        self.compacted_weights = []
+        self.imported_calories.clear()
+
+    def save_calorie_intake(self, date, calories):
+        date_str = date.isoformat()
+        self.logs['intake'][date_str] = self.logs['intake'].get(date_str, 0) + calories
+
+    def get_calorie_intake(self, date):
+        return self.logs['intake'].get(date.isoformat(), 0)
+
+    def save_calories_burned(self, date, calories):
+        date_str = date.isoformat()
+        self.logs['burned'][date_str] = self.logs['burned'].get(date_str, 0) + calories
+
+    def save_imported_calories(self, source, entries):
+        differences = []
+        for date, calories in entries:
+            key = (source, date.isoformat())
+            previous = self.imported_calories.get(key, 0)
+            self.imported_calories[key] = calories
+            if calories != previous:
+                differences.append((date, calories - previous))
+        self.save_calories_burned_batch(differences)
+        return differences
+
+    def get_calories_burned(self, date):
+        return self.logs['burned'].get(date.isoformat(), 0)
+
+    def get_all_dates(self):
+        return sorted(set().union(*self.logs.values()))
+
+    def save_weight_entry(self, date, weight):
+        self.logs['weight'][date.isoformat()] = weight
+
+    def get_weight_entries(self):
+        return sorted(self.logs['weight'].items())
+
+    def get_daily_values(self, metric, start_date, end_date):
+        start_str = start_date.isoformat()
+        end_str = end_date.isoformat()
+        return sorted((date_str, value) for date_str, value in self.logs[metric].items() if start_str <= date_str <= end_str)
+
+    def get_first_weight(self):
+        if self.compacted_weights:
+            return self.compacted_weights[0][1]
+        return super().get_first_weight()
+
+    def get_latest_weight(self):
+        latest_weight = super().get_latest_weight()
+        if latest_weight is None and self.compacted_weights:
+            return self.compacted_weights[-1][1]
+        return latest_weight
+
+    def get_date_range(self):
+        first, last = super().get_date_range()
+        periods = [date.fromisoformat(period) for rollup in self.rollups.values() for period, _ in rollup]
+        if not periods:
+            return first, last
+        if first is None:
+            return min(periods), max(periods)
+        return min(first, *periods), max(last, *periods)
+
+    def get_compacted_before(self):
+        return self.compacted_before
+
+    def get_history(self, metric, start_date, end_date, resolution=None):
+        # Merges the compacted periods into the aggregates of the remaining daily values
+        if resolution is None:
+            resolution = self.choose_resolution(start_date, end_date)
+        history = super().get_history(metric, start_date, end_date, resolution)
+        if resolution == 'day':
+            return history
+        periods = {period: [total, count, low, high] for period, total, _, low, high, count in history}
+        range_start = period_start(start_date, resolution).isoformat()
+        for (period, rollup_metric), (total, count, low, high) in self.rollups[resolution].items():
+            if rollup_metric != metric or not range_start <= period <= end_date.isoformat():
+                continue
+            if period in periods:
+                merged = periods[period]
+                periods[period] = [merged[0] + total, merged[1] + count, min(merged[2], low), max(merged[3], high)]
+            else:
+                periods[period] = [total, count, low, high]
+        return [
+            (period, total, total / count, low, high, count)
+            for period, (total, count, low, high) in sorted(periods.items())
+        ]
+
+    def compact_history(self, retention_days=DEFAULT_RETENTION_DAYS, today=None):
+        if today is None:
+            today = date.today()
+        cutoff = today - timedelta(days=retention_days)
+        compacted = 0
+        for metric, log in self.logs.items():
+            for date_str in [date_str for date_str in log if date_str < cutoff.isoformat()]:
+                value = log.pop(date_str)
+                if metric == 'weight':
+                    weights = sorted(self.compacted_weights + [(date_str, value)])
+                    self.compacted_weights = [weights[0], weights[-1]]
+                for resolution, rollup in self.rollups.items():
+                    key = (period_start(date.fromisoformat(date_str), resolution).isoformat(), metric)
+                    if key in rollup:
+                        total, count, low, high = rollup[key]
+                        rollup[key] = [total + value, count + 1, min(low, value), max(high, value)]
+                    else:
+                        rollup[key] = [value, 1, value, value]
+                compacted += 1
+        if self.compacted_before is None or self.compacted_before < cutoff:
+            self.compacted_before = cutoff
+        return compacted
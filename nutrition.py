@@ -2,8 +2,6 @@
 # Author: Huy Vu
 # Description: Manages logging and retrieval of daily calorie intake.
 
-from data_storage import DataStorage
-
 class CalorieIntakeLog:
     def __init__(self, data_storage):
         self.data_storage = data_storage
@@ -24,27 +24,43 @@ def generate_pdf_report(calorie_intake_log, activity_log, user):
     weights = []
     
     # Calculate net calories and expected calories
-    all_dates = calorie_intake_log.data_storage.get_all_dates()
+    data_storage = calorie_intake_log.data_storage
+    first_date, last_date = data_storage.get_date_range()
     start_date = user.start_date
     if user.goal_weight_kg and user.weekly_weight_change:
         daily_expected_calorie_change = (7700 * user.weekly_weight_change) / 7
     else:
         daily_expected_calorie_change = 0
 
-    for date_str in all_dates:
+    # Long histories are plotted per week or month instead of per day
+    if first_date is not None:
+        resolution = data_storage.choose_resolution(first_date, last_date)
+        intake_history = {row[0]: row for row in data_storage.get_history('intake', first_date, last_date, resolution)}
+        burned_history = {row[0]: row for row in data_storage.get_history('burned', first_date, last_date, resolution)}
+        weight_history = data_storage.get_history('weight', first_date, last_date, resolution)
+    else:
+        resolution = 'day'
+        intake_history = {}
+        burned_history = {}
+        weight_history = []
+    resolution_label = {'day': '', 'week': ' (weekly averages)', 'month': ' (monthly averages)'}[resolution]
+
+    for date_str in sorted(set(intake_history) | set(burned_history)):
         date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-        intake = calorie_intake_log.get_daily_intake(date_obj)
-        burned = activity_log.get_daily_activity(date_obj)
-        net_cal = intake - burned
+        intake = intake_history[date_str][1] if date_str in intake_history else 0
+        burned = burned_history[date_str][1] if date_str in burned_history else 0
+        # Average over the days logged in the period
+        logged_days = max(intake_history[date_str][5] if date_str in intake_history else 0,
+                          burned_history[date_str][5] if date_str in burned_history else 0)
+        net_cal = (intake - burned) / logged_days
         days_since_start = (date_obj - start_date).days
         dates.append(days_since_start)
         net_calories.append(net_cal)
         expected_calories.append(daily_expected_calorie_change)
-    
+
     # Get weight entries
-    weight_entries = calorie_intake_log.data_storage.get_weight_entries()
-    for entry in weight_entries:
-        date_str, weight_kg = entry
+    for entry in weight_history:
+        date_str, weight_kg = entry[0], entry[2]
         date_obj = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
         days_since_start = (date_obj - start_date).days
         weight_dates.append(days_since_start)
@@ -54,21 +70,18 @@ def generate_pdf_report(calorie_intake_log, activity_log, user):
             weight = weight_kg
         weights.append(weight)
     
-    # Calculate achievements
-    if weights:
-        starting_weight = weights[0]
-        latest_weight = weights[-1]
+    # Calculate achievements from the first and latest weigh-ins; the plotted weights may be period averages
+    first_weight_kg = data_storage.get_first_weight()
+    latest_weight_kg = data_storage.get_latest_weight()
+    if first_weight_kg is None or latest_weight_kg is None:
+        first_weight_kg = user.weight_kg
+        latest_weight_kg = user.weight_kg
+    if user.units == 'imperial':
+        total_weight_change = kg_to_lbs(first_weight_kg) - kg_to_lbs(latest_weight_kg)
     else:
-        if user.units == 'imperial':
-            starting_weight = kg_to_lbs(user.weight_kg)
-            latest_weight = starting_weight
-        else:
-            starting_weight = user.weight_kg
-            latest_weight = starting_weight
-    
-    total_weight_change = starting_weight - latest_weight
+        total_weight_change = first_weight_kg - latest_weight_kg
     
-    days_to_goal = user.days_to_goal(current_weight=latest_weight if weights else user.weight_kg)
+    days_to_goal = user.days_to_goal(current_weight=latest_weight_kg)
     if days_to_goal > 0:
         estimated_goal_date = datetime.date.today() + datetime.timedelta(days=days_to_goal)
         achievement_text = (
@@ -146,7 +159,7 @@ def generate_pdf_report(calorie_intake_log, activity_log, user):
             ax.plot(dates, expected_calories, marker='x', label='Expected Calorie Change')
             ax.set_xlabel('Days Since Start')
             ax.set_ylabel('Calories')
-            ax.set_title('Net Calories vs. Expected Calories Over Time', fontsize=12)
+            ax.set_title(f'Net Calories vs. Expected Calories Over Time{resolution_label}', fontsize=12)
             ax.legend()
             ax.grid(True)
             pdf.savefig()
@@ -160,7 +173,7 @@ def generate_pdf_report(calorie_intake_log, activity_log, user):
             ax.plot(weight_dates, weights, marker='o')
             ax.set_xlabel('Days Since Start')
             ax.set_ylabel(f'Weight ({weight_unit})')
-            ax.set_title('Weight Over Time', fontsize=12)
+            ax.set_title(f'Weight Over Time{resolution_label}', fontsize=12)
             ax.grid(True)
             pdf.savefig()
             plt.close()
@@ -0,0 +1,230 @@
+# storage_backend.py
+# Author: Huy Vu
+# Description: Defines the storage backend interface shared by the SQLite, in-memory and journal storages.
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from user import UserProfile
+from utils import kg_to_lbs, cm_to_inches
+
+# Daily history older than this is rolled into weekly and monthly aggregates by default
+DEFAULT_RETENTION_DAYS = 365
+
+# Longest span, in days, reported at each resolution before switching to a coarser one
+RESOLUTION_MAX_SPAN_DAYS = {
+    'day': 92,
+    'week': 731
+}
+
+def period_start(date_obj, resolution):
+    if resolution == 'week':
+        return date_obj - timedelta(days=date_obj.weekday())
+    if resolution == 'month':
+        return date_obj.replace(day=1)
+    return date_obj
+
+def profile_to_dict(user):
+    # Convert date objects to strings
+    user_data = user.__dict__.copy()
+    if isinstance(user_data.get('start_date'), date):
+        user_data['start_date'] = user_data['start_date'].isoformat()
+    return user_data
+
+def profile_from_dict(data):
+    user = UserProfile(
+        data['name'],
+        data['age'],
+        data['gender'],
+        data['height_cm'] if data['units'] == 'metric' else cm_to_inches(data['height_cm']),
+        data['weight_kg'] if data['units'] == 'metric' else kg_to_lbs(data['weight_kg']),
+        data['activity_level'],
+        data['units']
+    )
+    user.goal_weight_kg = data.get('goal_weight_kg')
+    user.weekly_weight_change = data.get('weekly_weight_change')
+    # Convert start_date back to date object
+    start_date_str = data.get('start_date')
+    if start_date_str:
+        user.start_date = datetime.fromisoformat(start_date_str).date()
+    else:
+        user.start_date = None
+    return user
+
+class StorageBackend(ABC):
+    """
+    Base class for DietMaster storages.
+
+    Subclasses implement the abstract profile, daily log and compaction methods; dates are
+    passed as date objects and returned as ISO date strings. Range queries, resolution
+    selection and batched writes have generic implementations that backends may override
+    with faster ones. Sync is optional and only offered when supports_sync is set.
+    """
+
+    # Whether sync_with is implemented
+    supports_sync = False
+
+    @abstractmethod
+    def save_user_profile(self, user):
+        pass
+
+    def update_user_profile(self, user):
+        self.save_user_profile(user)
+
+    @abstractmethod
+    def load_user_profile(self):
+        pass
+
+    @abstractmethod
+    def delete_user_profile(self):
+        pass
+
+    @abstractmethod
+    def clear_all_data(self):
+        pass
+
+    @abstractmethod
+    def save_calorie_intake(self, date, calories):
+        pass
+
+    @abstractmethod
+    def get_calorie_intake(self, date):
+        pass
+
+    @abstractmethod
+    def save_calories_burned(self, date, calories):
+        pass
+
+    def save_calories_burned_batch(self, entries):
+        for date, calories in entries:
+            self.save_calories_burned(date, calories)
+
+    @abstractmethod
+    def save_imported_calories(self, source, entries):
+        """
+        Saves calories burned imported from a source, replacing what was imported from it before.
+
+        The calories imported per source and date are kept, and only the difference is added to
+        the calories burned, so importing the same file again does not count it twice.
+
+        Parameters:
+            source (str): Name of the imported file.
+            entries (list): (date, calories) tuples.
+
+        Returns:
+            list: (date, calories) tuples of the differences added to the calories burned.
+        """
+
+    @abstractmethod
+    def get_calories_burned(self, date):
+        pass
+
+    @abstractmethod
+    def get_all_dates(self):
+        pass
+
+    @abstractmethod
+    def save_weight_entry(self, date, weight):
+        pass
+
+    @abstractmethod
+    def get_weight_entries(self):
+        pass
+
+    def get_first_weight(self):
+        weight_entries = self.get_weight_entries()
+        if weight_entries:
+            return weight_entries[0][1]
+        else:
+            return None
+
+    def get_latest_weight(self):
+        weight_entries = self.get_weight_entries()
+        if weight_entries:
+            return weight_entries[-1][1]
+        else:
+            return None
+
+    @abstractmethod
+    def get_daily_values(self, metric, start_date, end_date):
+        """
+        Returns the daily values of a metric over a date range.
+
+        Parameters:
+            metric (str): 'intake', 'burned' or 'weight'.
+            start_date (date): First date of the range.
+            end_date (date): Last date of the range.
+
+        Returns:
+            list: (date, value) tuples ordered by date, with date as an ISO date string.
+        """
+
+    def get_date_range(self):
+        all_dates = self.get_all_dates()
+        if not all_dates:
+            return None, None
+        return date.fromisoformat(all_dates[0]), date.fromisoformat(all_dates[-1])
+
+    def get_compacted_before(self):
+        return None
+
+    def choose_resolution(self, start_date, end_date):
+        # The coarsest resolution needed to keep the number of points bounded for the span
+        span_days = (end_date - start_date).days
+        for resolution in ('day', 'week'):
+            if span_days <= RESOLUTION_MAX_SPAN_DAYS[resolution]:
+                break
+        else:
+            resolution = 'month'
+        # Daily values are no longer available before the compaction cutoff
+        compacted_before = self.get_compacted_before()
+        if resolution == 'day' and compacted_before is not None and start_date < compacted_before:
+            resolution = 'week'
+        return resolution
+
+    def get_history(self, metric, start_date, end_date, resolution=None):
+        """
+        Returns a metric over a date range, aggregated per day, week or month.
+
+        Parameters:
+            metric (str): 'intake', 'burned' or 'weight'.
+            start_date (date): First date of the range.
+            end_date (date): Last date of the range.
+            resolution (str): 'day', 'week' or 'month'; chosen from the span if None.
+
+        Returns:
+            list: (period_start, total, mean, min, max, count) tuples ordered by period,
+            with period_start as an ISO date string.
+        """
+        if resolution is None:
+            resolution = self.choose_resolution(start_date, end_date)
+        periods = defaultdict(list)
+        range_start = period_start(start_date, resolution)
+        for date_str, value in self.get_daily_values(metric, range_start, end_date):
+            periods[period_start(date.fromisoformat(date_str), resolution).isoformat()].append(value)
+        return [
+            (period, sum(values), sum(values) / len(values), min(values), max(values), len(values))
+            for period, values in sorted(periods.items())
+        ]
+
+    @abstractmethod
+    def compact_history(self, retention_days=DEFAULT_RETENTION_DAYS, today=None):
+        """
+        Rolls daily history older than the retention horizon into weekly and monthly aggregates.
+
+        Parameters:
+            retention_days (int): Number of days of daily history to keep.
+            today (date): Reference date, defaults to today.
+
+        Returns:
+            int: Number of daily rows compacted.
+        """
+
+    def sync_with(self, db_path):
+        raise NotImplementedError("Sync is not supported by this storage backend.")
+
+    def assign_new_replica_id(self):
+        raise NotImplementedError("Sync is not supported by this storage backend.")
+
+    def close(self):
+        pass
@@ -0,0 +1,22 @@
+# storage_test_case.py
+# Author: Huy Vu
+# Description: Shared base class for tests that work with database and export files.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+class TempDirTestCase(unittest.TestCase):
+    """
+    Test case with a temporary directory that is removed after each test.
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir, name)
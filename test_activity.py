@@ -0,0 +1,55 @@
+# test_activity.py
+# Author: Huy Vu
+# Description: Tests for activity calorie calculation and logging.
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+from activity import ActivityLog, ACTIVITY_METS, calculate_activity_calories
+from memory_storage import InMemoryStorage
+from utils import get_activity_entries_input
+
+class ActivityTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.activity_log = ActivityLog(self.storage)
+
+    def test_calculate_activity_calories(self):
+        # Running is 9.8 MET: 9.8 * 3.5 * 80 / 200 kcal per minute
+        self.assertAlmostEqual(calculate_activity_calories('Running', 30, 80), 411.6)
+        with self.assertRaises(ValueError):
+            calculate_activity_calories('juggling', 30, 80)
+
+    def test_durations_must_be_positive(self):
+        for minutes in (0, -30):
+            with self.assertRaises(ValueError):
+                calculate_activity_calories('running', minutes, 80)
+
+    @patch('builtins.print')
+    def test_log_activities_writes_daily_totals(self, _):
+        entries = [
+            (date(2024, 1, 1), 'running', 30),
+            (date(2024, 1, 1), 'yoga', 60),
+            (date(2024, 1, 2), 'walking', 40)
+        ]
+        total = self.activity_log.log_activities(entries, 80)
+        self.assertAlmostEqual(self.storage.get_calories_burned(date(2024, 1, 1)), 411.6 + 210)
+        self.assertAlmostEqual(self.storage.get_calories_burned(date(2024, 1, 2)), 196)
+        self.assertAlmostEqual(total, 411.6 + 210 + 196)
+
+    @patch('builtins.print')
+    def test_log_activities_rejects_whole_batch(self, _):
+        entries = [(date(2024, 1, 1), 'running', 30), (date(2024, 1, 2), 'walking', 0)]
+        with self.assertRaises(ValueError):
+            self.activity_log.log_activities(entries, 80)
+        self.assertEqual(self.storage.get_all_dates(), [])
+
+    @patch('builtins.print')
+    def test_bulk_input_rejects_non_positive_durations(self, _):
+        inputs = ['2024-01-01,running,-30', '2024-01-01,running,30; 2024-01-02,yoga,45']
+        with patch('builtins.input', side_effect=inputs):
+            entries = get_activity_entries_input('Activities: ', ACTIVITY_METS)
+        self.assertEqual(entries, [(date(2024, 1, 1), 'running', 30), (date(2024, 1, 2), 'yoga', 45)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+# test_data_storage.py
+# Author: Huy Vu
+# Description: Tests for the SQLite data storage, including sync between databases.
+
+import os
+import shutil
+import sqlite3
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+from data_storage import DataStorage
+from storage_test_case import TempDirTestCase
+
+class DataStorageSyncTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = date(2024, 1, 1)
+
+    def create_legacy_db(self, name, intake, burned, weight):
+        # A database written before the change log existed
+        conn = sqlite3.connect(self.path(name))
+        conn.execute('CREATE TABLE calorie_intake_log (date TEXT PRIMARY KEY, calories REAL)')
+        conn.execute('CREATE TABLE activity_log (date TEXT PRIMARY KEY, calories_burned REAL)')
+        conn.execute('CREATE TABLE weight_log (date TEXT PRIMARY KEY, weight REAL)')
+        conn.execute('INSERT INTO calorie_intake_log VALUES (?, ?)', (self.day.isoformat(), intake))
+        conn.execute('INSERT INTO activity_log VALUES (?, ?)', (self.day.isoformat(), burned))
+        conn.execute('INSERT INTO weight_log VALUES (?, ?)', (self.day.isoformat(), weight))
+        conn.commit()
+        conn.close()
+
+    def assert_day(self, storage, intake, burned, weight):
+        self.assertEqual(storage.get_calorie_intake(self.day), intake)
+        self.assertEqual(storage.get_calories_burned(self.day), burned)
+        self.assertEqual(storage.get_weight_entries(), [(self.day.isoformat(), weight)])
+
+    def test_sync_copies_of_existing_db(self):
+        self.create_legacy_db('laptop.db', 2000, 500, 80)
+        shutil.copy(self.path('laptop.db'), self.path('server.db'))
+        laptop = DataStorage(self.path('laptop.db'))
+        server = DataStorage(self.path('server.db'))
+        server.save_calorie_intake(self.day, 100)
+        server.close()
+
+        laptop.sync_with(self.path('server.db'))
+        laptop.sync_with(self.path('server.db'))
+        server = DataStorage(self.path('server.db'))
+        self.assert_day(laptop, 2100, 500, 80)
+        self.assert_day(server, 2100, 500, 80)
+        laptop.close()
+        server.close()
+
+    def test_sync_diverged_copies_of_existing_db(self):
+        self.create_legacy_db('laptop.db', 2000, 500, 80)
+        self.create_legacy_db('server.db', 2200, 400, 79)
+        laptop = DataStorage(self.path('laptop.db'))
+        DataStorage(self.path('server.db')).close()
+        third = DataStorage(self.path('third.db'))
+        third.sync_with(self.path('server.db'))
+
+        laptop.sync_with(self.path('server.db'))
+        laptop.sync_with(self.path('third.db'))
+        server = DataStorage(self.path('server.db'))
+        third.close()
+        third = DataStorage(self.path('third.db'))
+        for storage in (laptop, server, third):
+            self.assert_day(storage, 2200, 500, 80)
+            storage.close()
+
+    def test_sync_copy_with_new_replica_id(self):
+        laptop = DataStorage(self.path('laptop.db'))
+        laptop.save_calorie_intake(self.day, 2000)
+        laptop.save_weight_entry(self.day, 80)
+        shutil.copy(self.path('laptop.db'), self.path('server.db'))
+        server = DataStorage(self.path('server.db'))
+        with self.assertRaises(ValueError):
+            laptop.sync_with(self.path('server.db'))
+
+        server.assign_new_replica_id()
+        server.save_calorie_intake(self.day, 100)
+        server.close()
+        laptop.save_calories_burned(self.day, 500)
+        laptop.sync_with(self.path('server.db'))
+        laptop.sync_with(self.path('server.db'))
+        server = DataStorage(self.path('server.db'))
+        self.assert_day(laptop, 2100, 500, 80)
+        self.assert_day(server, 2100, 500, 80)
+        laptop.close()
+        server.close()
+
+    def test_sync_records_what_each_peer_received(self):
+        laptop = DataStorage(self.path('laptop.db'))
+        self.assertIsNone(laptop.get_peers_synced_seq())
+        laptop.save_calorie_intake(self.day, 2000)
+        server = DataStorage(self.path('server.db'))
+        server.save_calorie_intake(self.day, 100)
+        server.close()
+        laptop.sync_with(self.path('server.db'))
+        server = DataStorage(self.path('server.db'))
+        # Changes received from the other database are part of each change log too
+        self.assertEqual(laptop.get_peers_synced_seq(), laptop.get_last_change_seq())
+        self.assertEqual(server.get_peers_synced_seq(), server.get_last_change_seq())
+        laptop.save_calorie_intake(self.day, 300)
+        self.assertLess(laptop.get_peers_synced_seq(), laptop.get_last_change_seq())
+        laptop.close()
+        server.close()
+
+    def test_latest_weight_wins_with_skewed_clocks(self):
+        laptop = DataStorage(self.path('laptop.db'))
+        # The laptop clock runs five minutes fast
+        fast_clock = (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat()
+        with patch('data_storage._utc_now', return_value=fast_clock):
+            laptop.save_weight_entry(self.day, 80)
+        laptop.sync_with(self.path('server.db'))
+        # A minute later, the weight is corrected on the server
+        server = DataStorage(self.path('server.db'))
+        server.save_weight_entry(self.day, 79)
+        server.close()
+
+        laptop.sync_with(self.path('server.db'))
+        server = DataStorage(self.path('server.db'))
+        for storage in (laptop, server):
+            self.assertEqual(storage.get_weight_entries(), [(self.day.isoformat(), 79)])
+            storage.close()
+
+    def test_reset_data_is_not_synced_to_a_new_copy(self):
+        storage = DataStorage(self.path('a.db'))
+        storage.save_calorie_intake(self.day, 5000)
+        storage.save_weight_entry(self.day, 90)
+        storage.clear_all_data()
+        storage.save_calorie_intake(self.day, 2000)
+        storage.sync_with(self.path('copy.db'))
+        copy = DataStorage(self.path('copy.db'))
+        self.assertEqual(copy.get_calorie_intake(self.day), 2000)
+        self.assertEqual(copy.get_weight_entries(), [])
+        storage.close()
+        copy.close()
+
+class DataStorageCompactionTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = date(2024, 1, 1)
+        self.today = date(2024, 12, 31)
+
+    def test_sync_after_compaction_keeps_history(self):
+        storage = DataStorage(self.path('a.db'))
+        for i in range(365):
+            storage.save_calorie_intake(self.start + timedelta(days=i), 2000)
+        storage.compact_history(90, today=self.today)
+        storage.sync_with(self.path('b.db'))
+        other = DataStorage(self.path('b.db'))
+        self.assertEqual(other.get_date_range(), (self.start, date(2024, 12, 30)))
+        self.assertEqual(
+            other.get_history('intake', self.start, self.today, 'month'),
+            storage.get_history('intake', self.start, self.today, 'month')
+        )
+        storage.close()
+        other.close()
+
+    def test_late_changes_for_compacted_dates(self):
+        day = date(2024, 3, 6)
+        storage = DataStorage(self.path('a.db'))
+        storage.save_calorie_intake(day, 2000)
+        storage.save_weight_entry(day, 80)
+        storage.sync_with(self.path('b.db'))
+        other = DataStorage(self.path('b.db'))
+        # The newer weight wins on both sides, the older one is ignored
+        other.save_weight_entry(day, 79)
+        other.save_calorie_intake(day, 100)
+        other.close()
+        storage.save_weight_entry(day, 81)
+        storage.compact_history(90, today=self.today)
+        storage.sync_with(self.path('b.db'))
+
+        intake = storage.get_history('intake', day, day, 'week')
+        weight = storage.get_history('weight', day, day, 'week')
+        self.assertEqual(intake, [('2024-03-04', 2100.0, 2100.0, 2100.0, 2100.0, 1)])
+        self.assertEqual(weight, [('2024-03-04', 81.0, 81.0, 81.0, 81.0, 1)])
+        storage.compact_history(90, today=self.today)
+        self.assertEqual(storage.get_history('weight', day, day, 'month'), [('2024-03-01', 81.0, 81.0, 81.0, 81.0, 1)])
+        storage.close()
+
+    def test_late_change_after_reset_does_not_restore_data(self):
+        day = date(2024, 3, 6)
+        storage = DataStorage(self.path('a.db'))
+        storage.save_calorie_intake(day, 5000)
+        storage.clear_all_data()
+        storage.save_calorie_intake(day, 2000)
+        storage.compact_history(90, today=self.today)
+        other = DataStorage(self.path('b.db'))
+        other.save_calorie_intake(day, 100)
+        other.close()
+
+        storage.sync_with(self.path('b.db'))
+        other = DataStorage(self.path('b.db'))
+        self.assertEqual(storage.get_history('intake', day, day, 'week'), [('2024-03-04', 2100.0, 2100.0, 2100.0, 2100.0, 1)])
+        self.assertEqual(other.get_calorie_intake(day), 2100)
+        storage.close()
+        other.close()
+
+    def test_compaction_keeps_file_size_bounded(self):
+        storage = DataStorage(self.path('a.db'))
+        days = [(self.start + timedelta(days=i)).isoformat() for i in range(365)]
+        storage.apply_changes([change for day in days for change in (
+            ('intake', day, 700), ('intake', day, 800), ('burned', day, 300), ('weight', day, 80), ('weight', day, 81)
+        )])
+        storage.compact_history(90, today=self.today)
+        size = os.path.getsize(self.path('a.db'))
+        # Later corrections to compacted dates are folded too, so the file stops growing
+        for _ in range(3):
+            storage.apply_changes([change for day in days[:200] for change in (('intake', day, 100), ('weight', day, 79))])
+            storage.compact_history(90, today=self.today)
+            self.assertLessEqual(os.path.getsize(self.path('a.db')), size * 1.05)
+
+        weeks = storage.get_history('intake', self.start, self.today, 'week')
+        self.assertEqual(weeks[0], ('2024-01-01', 12600.0, 1800.0, 1800.0, 1800.0, 7))
+        self.assertEqual(storage.get_history('weight', self.start, self.start, 'week')[0][1:], (553.0, 79.0, 79.0, 79.0, 7))
+        storage.close()
+
+    def test_sync_after_change_log_is_folded(self):
+        day = date(2024, 3, 6)
+        storage = DataStorage(self.path('a.db'))
+        storage.save_calorie_intake(day, 2000)
+        storage.sync_with(self.path('b.db'))
+        # Not yet received by b, so kept as is by the first compaction
+        storage.save_calorie_intake(day, 300)
+        storage.save_calorie_intake(day, 200)
+        storage.compact_history(90, today=self.today)
+        storage.sync_with(self.path('b.db'))
+        storage.compact_history(90, today=self.today)
+        storage.sync_with(self.path('b.db'))
+        storage.sync_with(self.path('c.db'))
+
+        other = DataStorage(self.path('b.db'))
+        new_copy = DataStorage(self.path('c.db'))
+        expected = [('2024-03-04', 2500.0, 2500.0, 2500.0, 2500.0, 1)]
+        for database in (storage, other, new_copy):
+            self.assertEqual(database.get_history('intake', day, day, 'week'), expected)
+        # b received the original changes, so receiving them again through c is a no-op
+        new_copy.close()
+        other.sync_with(self.path('c.db'))
+        self.assertEqual(other.get_calorie_intake(day), 2500)
+        storage.close()
+        other.close()
+
+if __name__ == '__main__':
+    unittest.main()
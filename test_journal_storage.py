@@ -0,0 +1,51 @@
+# test_journal_storage.py
+# Author: Huy Vu
+# Description: Tests for the append-only journal storage backend.
+
+import unittest
+from datetime import date
+from journal_storage import JournalStorage
+from storage_test_case import TempDirTestCase
+
+class JournalStorageTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal_path = self.path('dietmaster.journal')
+        self.db_path = self.path('dietmaster.db')
+        self.day = date(2024, 1, 1)
+
+    def test_entries_survive_restart(self):
+        storage = JournalStorage(self.journal_path, self.db_path)
+        storage.save_calorie_intake(self.day, 100)
+        storage.save_weight_entry(self.day, 80)
+        # Simulate a crash: the journal is left behind without being compacted
+        storage.journal.close()
+        storage.storage.close()
+
+        storage = JournalStorage(self.journal_path, self.db_path)
+        self.assertEqual(storage.get_calorie_intake(self.day), 100)
+        self.assertEqual(storage.get_weight_entries(), [(self.day.isoformat(), 80)])
+        storage.close()
+
+    def test_crash_during_compaction_does_not_replay_journal(self):
+        storage = JournalStorage(self.journal_path, self.db_path)
+        storage.save_calorie_intake(self.day, 100)
+
+        def crash():
+            raise OSError("crashed before truncating the journal")
+        storage._start_journal = crash
+        with self.assertRaises(OSError):
+            storage.compact()
+        storage.journal.close()
+        storage.storage.close()
+
+        storage = JournalStorage(self.journal_path, self.db_path)
+        self.assertEqual(storage.get_calorie_intake(self.day), 100)
+        storage.save_calorie_intake(self.day, 50)
+        storage.close()
+        storage = JournalStorage(self.journal_path, self.db_path)
+        self.assertEqual(storage.get_calorie_intake(self.day), 150)
+        storage.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+# test_storage_backends.py
+# Author: Huy Vu
+# Description: Behaviour tests shared by every storage backend.
+
+import unittest
+from datetime import date
+from data_storage import DataStorage
+from journal_storage import JournalStorage
+from memory_storage import InMemoryStorage
+from storage_backend import StorageBackend
+from storage_test_case import TempDirTestCase
+from user import UserProfile
+
+class StorageBackendTests:
+    """
+    Tests run against each backend; subclasses provide create_storage().
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.storage = self.create_storage()
+        self.day = date(2024, 1, 1)
+
+    def tearDown(self):
+        self.storage.close()
+        super().tearDown()
+
+    def save_history(self):
+        # Two days in the first week of January, one in the second week and one in February
+        self.storage.save_calorie_intake(date(2024, 1, 1), 2000)
+        self.storage.save_calorie_intake(date(2024, 1, 2), 1000)
+        self.storage.save_calorie_intake(date(2024, 1, 8), 1500)
+        self.storage.save_calorie_intake(date(2024, 2, 1), 500)
+
+    def test_intake_and_burned_are_additive(self):
+        self.storage.save_calorie_intake(self.day, 1200)
+        self.storage.save_calorie_intake(self.day, 800)
+        self.storage.save_calories_burned(self.day, 300)
+        self.storage.save_calories_burned(self.day, 200)
+        self.assertEqual(self.storage.get_calorie_intake(self.day), 2000)
+        self.assertEqual(self.storage.get_calories_burned(self.day), 500)
+        self.assertEqual(self.storage.get_calorie_intake(date(2024, 1, 2)), 0)
+
+    def test_weight_entry_is_replaced(self):
+        self.storage.save_weight_entry(self.day, 80)
+        self.storage.save_weight_entry(self.day, 79.5)
+        self.assertEqual(self.storage.get_weight_entries(), [(self.day.isoformat(), 79.5)])
+
+    def test_save_calories_burned_batch(self):
+        self.storage.save_calories_burned(self.day, 100)
+        self.storage.save_calories_burned_batch([(self.day, 250), (date(2024, 1, 2), 400)])
+        self.assertEqual(self.storage.get_calories_burned(self.day), 350)
+        self.assertEqual(self.storage.get_calories_burned(date(2024, 1, 2)), 400)
+
+    def test_save_imported_calories_adds_the_difference(self):
+        self.storage.save_calories_burned(self.day, 100)
+        self.assertEqual(self.storage.save_imported_calories('watch.csv', [(self.day, 300)]), [(self.day, 300)])
+        self.assertEqual(self.storage.save_imported_calories('watch.csv', [(self.day, 300)]), [])
+        self.storage.save_imported_calories('watch.csv', [(self.day, 250), (date(2024, 1, 2), 400)])
+        self.storage.save_imported_calories('run.gpx', [(self.day, 500)])
+        self.assertEqual(self.storage.get_calories_burned(self.day), 850)
+        self.assertEqual(self.storage.get_calories_burned(date(2024, 1, 2)), 400)
+
+    def test_get_latest_weight(self):
+        self.assertIsNone(self.storage.get_latest_weight())
+        self.storage.save_weight_entry(date(2024, 1, 3), 79)
+        self.storage.save_weight_entry(self.day, 80)
+        self.assertEqual(self.storage.get_latest_weight(), 79)
+        self.assertEqual(self.storage.get_first_weight(), 80)
+
+    def test_first_and_latest_weight_survive_compaction(self):
+        self.storage.save_weight_entry(self.day, 80)
+        self.storage.save_weight_entry(date(2024, 1, 2), 79)
+        self.storage.save_weight_entry(date(2024, 1, 3), 78.5)
+        self.storage.compact_history(0, today=date(2024, 1, 3))
+        self.assertEqual(self.storage.get_first_weight(), 80)
+        self.assertEqual(self.storage.get_latest_weight(), 78.5)
+        self.storage.compact_history(0, today=date(2024, 1, 10))
+        self.assertEqual(self.storage.get_first_weight(), 80)
+        self.assertEqual(self.storage.get_latest_weight(), 78.5)
+
+    def test_get_history_by_day_week_and_month(self):
+        self.save_history()
+        end = date(2024, 2, 29)
+        self.assertEqual(self.storage.get_history('intake', self.day, date(2024, 1, 8), 'day'), [
+            ('2024-01-01', 2000, 2000, 2000, 2000, 1),
+            ('2024-01-02', 1000, 1000, 1000, 1000, 1),
+            ('2024-01-08', 1500, 1500, 1500, 1500, 1)
+        ])
+        self.assertEqual(self.storage.get_history('intake', self.day, end, 'week'), [
+            ('2024-01-01', 3000, 1500, 1000, 2000, 2),
+            ('2024-01-08', 1500, 1500, 1500, 1500, 1),
+            ('2024-01-29', 500, 500, 500, 500, 1)
+        ])
+        self.assertEqual(self.storage.get_history('intake', self.day, end, 'month'), [
+            ('2024-01-01', 4500, 1500, 1000, 2000, 3),
+            ('2024-02-01', 500, 500, 500, 500, 1)
+        ])
+
+    def test_compaction_keeps_aggregates(self):
+        self.save_history()
+        end = date(2024, 2, 29)
+        monthly = self.storage.get_history('intake', self.day, end, 'month')
+        self.assertEqual(self.storage.compact_history(0, today=date(2024, 1, 5)), 2)
+        self.assertEqual(self.storage.get_compacted_before(), date(2024, 1, 5))
+        self.assertEqual(self.storage.choose_resolution(self.day, end), 'week')
+        self.assertEqual(self.storage.get_history('intake', self.day, end, 'month'), monthly)
+        self.assertEqual(self.storage.get_date_range(), (self.day, date(2024, 2, 1)))
+
+    def test_clear_all_data(self):
+        self.storage.save_user_profile(UserProfile('Jane', 30, 'female', 165, 60, 'sedentary', 'metric'))
+        self.save_history()
+        self.storage.save_calories_burned(self.day, 300)
+        self.storage.save_weight_entry(self.day, 60)
+        self.storage.compact_history(0, today=date(2024, 1, 5))
+        self.storage.clear_all_data()
+        self.assertIsNone(self.storage.load_user_profile())
+        self.assertEqual(self.storage.get_calorie_intake(date(2024, 1, 8)), 0)
+        self.assertEqual(self.storage.get_all_dates(), [])
+        self.assertEqual(self.storage.get_date_range(), (None, None))
+        self.assertIsNone(self.storage.get_compacted_before())
+        self.assertIsNone(self.storage.get_latest_weight())
+        self.assertEqual(self.storage.get_history('intake', self.day, date(2024, 2, 29), 'month'), [])
+
+class InMemoryStorageTest(StorageBackendTests, unittest.TestCase):
+    def create_storage(self):
+        return InMemoryStorage()
+
+class SQLiteStorageTest(StorageBackendTests, TempDirTestCase):
+    def create_storage(self):
+        return DataStorage(self.path('dietmaster.db'))
+
+class JournalStorageBackendTest(StorageBackendTests, TempDirTestCase):
+    def create_storage(self):
+        return JournalStorage(self.path('dietmaster.journal'), self.path('dietmaster.db'))
+
+class StorageBackendInterfaceTest(unittest.TestCase):
+    def test_incomplete_backend_cannot_be_created(self):
+        class IncompleteStorage(StorageBackend):
+            def save_user_profile(self, user):
+                pass
+
+        with self.assertRaises(TypeError):
+            IncompleteStorage()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# test_wearable_import.py
+# Author: Huy Vu
+# Description: Tests for streaming wearable exports into daily calories burned.
+
+import tracemalloc
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from memory_storage import InMemoryStorage
+from storage_test_case import TempDirTestCase
+from user import UserProfile
+from wearable_import import (CALORIES_PER_STEP_PER_KG, MAX_SAMPLE_GAP_MINUTES, heart_rate_calories_per_minute,
+                             import_wearable_files, iter_gpx_samples, parse_timestamp)
+
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+    '<trk><trkseg>\n'
+)
+GPX_TRACKPOINT = (
+    '<trkpt lat="52.0" lon="4.0"><ele>1.0</ele><time>{time}</time><extensions>'
+    '<gpxtpx:TrackPointExtension><gpxtpx:hr>{hr}</gpxtpx:hr></gpxtpx:TrackPointExtension>'
+    '</extensions></trkpt>\n'
+)
+GPX_FOOTER = '</trkseg></trk>\n</gpx>\n'
+
+def utc_string(local_timestamp):
+    # The Z-suffixed export form of a naive local timestamp
+    return local_timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class WearableImportTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = InMemoryStorage()
+        self.user = UserProfile('John', 30, 'male', 180, 80, 'sedentary', 'metric')
+        self.day = date(2024, 1, 1)
+
+    def write_export(self, name, header, rows):
+        with open(self.path(name), 'w') as f:
+            f.write(header + '\n')
+            for row in rows:
+                f.write(','.join(str(value) for value in row) + '\n')
+        return self.path(name)
+
+    def write_gpx(self, name, trackpoints):
+        with open(self.path(name), 'w') as f:
+            f.write(GPX_HEADER)
+            for timestamp, heart_rate in trackpoints:
+                f.write(GPX_TRACKPOINT.format(time=utc_string(timestamp), hr=heart_rate))
+            f.write(GPX_FOOTER)
+        return self.path(name)
+
+    def active_calories_per_minute(self, heart_rate):
+        resting_per_minute = self.user.calculate_bmr() / (24 * 60)
+        total_per_minute = heart_rate_calories_per_minute(heart_rate, self.user.weight_kg, self.user.age, self.user.gender)
+        return total_per_minute - resting_per_minute
+
+    def minutes(self, start, count):
+        return [start + timedelta(minutes=minute) for minute in range(count)]
+
+    def import_files(self, *paths):
+        return import_wearable_files(list(paths), self.storage, self.user, self.user.weight_kg)
+
+    def test_resting_heart_rate_day_imports_no_calories(self):
+        start = datetime(2024, 1, 1)
+        path = self.write_export('resting.csv', 'timestamp,heart_rate',
+                                 [(timestamp.isoformat(), 62) for timestamp in self.minutes(start, 24 * 60)])
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 0)
+
+    def test_resting_energy_is_subtracted_from_total_energy(self):
+        start = datetime(2024, 1, 1)
+        resting_per_minute = self.user.calculate_bmr() / (24 * 60)
+        path = self.write_export('energy.csv', 'timestamp,calories',
+                                 [(timestamp.isoformat(), resting_per_minute) for timestamp in self.minutes(start, 24 * 60)])
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 0, places=3)
+
+    def test_workout_heart_rate_counts_active_energy(self):
+        start = datetime(2024, 1, 1, 7)
+        path = self.write_export('run.csv', 'timestamp,heart_rate',
+                                 [(timestamp.isoformat(), 150) for timestamp in self.minutes(start, 31)])
+        self.import_files(path)
+        # 30 minutes at 150 bpm is well above resting energy but not more than a hard run
+        self.assertGreater(self.storage.get_calories_burned(self.day), 200)
+        self.assertLess(self.storage.get_calories_burned(self.day), 500)
+
+    def test_reimport_only_adds_the_difference(self):
+        start = datetime(2024, 1, 1, 7)
+        rows = [(timestamp.isoformat(), 5) for timestamp in self.minutes(start, 60)]
+        path = self.write_export('watch.csv', 'timestamp,active_calories', rows)
+        self.assertEqual(self.import_files(path), {self.day: 300})
+        self.assertEqual(self.import_files(path), {})
+        self.assertEqual(self.storage.get_calories_burned(self.day), 300)
+        # A newer export of the same file with another hour of the day and the next day
+        path = self.write_export('watch.csv', 'timestamp,active_calories',
+                                 rows + [(timestamp.isoformat(), 5) for timestamp in self.minutes(start + timedelta(hours=1), 60)]
+                                 + [(timestamp.isoformat(), 5) for timestamp in self.minutes(start + timedelta(days=1), 60)])
+        self.assertEqual(self.import_files(path), {self.day: 300, date(2024, 1, 2): 300})
+        self.assertEqual(self.storage.get_calories_burned(self.day), 600)
+
+    def test_parse_timestamp_returns_naive_local_time(self):
+        local = datetime(2024, 1, 1, 7, 30)
+        self.assertEqual(parse_timestamp(utc_string(local)), local)
+        self.assertEqual(parse_timestamp(' 2024-01-01T07:30:00 '), local)
+
+    def test_mixed_naive_and_utc_timestamps(self):
+        start = datetime(2024, 1, 1, 7)
+        rows = [(timestamp.isoformat() if minute % 2 else utc_string(timestamp), 150)
+                for minute, timestamp in enumerate(self.minutes(start, 11))]
+        path = self.write_export('mixed.csv', 'timestamp,heart_rate', rows)
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 10 * self.active_calories_per_minute(150))
+
+    def test_gaps_are_not_counted(self):
+        start = datetime(2024, 1, 1, 7)
+        after_gap = start + timedelta(minutes=1 + MAX_SAMPLE_GAP_MINUTES + 1)
+        rows = [(timestamp.isoformat(), 150) for timestamp in self.minutes(start, 2) + self.minutes(after_gap, 2)]
+        path = self.write_export('gap.csv', 'timestamp,heart_rate', rows)
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 2 * self.active_calories_per_minute(150))
+
+    def test_steps_are_used_without_heart_rate(self):
+        start = datetime(2024, 1, 1, 7)
+        rows = [(timestamp.isoformat(), '', 100) for timestamp in self.minutes(start, 10)]
+        path = self.write_export('steps.csv', 'Timestamp,Heart_Rate,Steps', rows)
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 1000 * CALORIES_PER_STEP_PER_KG * self.user.weight_kg)
+
+    def test_csv_without_timestamp_column_is_rejected(self):
+        path = self.write_export('no_time.csv', 'heart_rate', [(150,)])
+        with self.assertRaises(ValueError):
+            self.import_files(path)
+
+    def test_gpx_namespaced_heart_rate(self):
+        start = datetime(2024, 1, 1, 7)
+        path = self.write_gpx('run.gpx', [(timestamp, 150) for timestamp in self.minutes(start, 31)])
+        self.assertEqual(next(iter_gpx_samples(path)), (start, None, None, 150, None))
+        self.import_files(path)
+        self.assertAlmostEqual(self.storage.get_calories_burned(self.day), 30 * self.active_calories_per_minute(150))
+
+    def test_invalid_gpx_is_rejected(self):
+        path = self.write_gpx('broken.gpx', [])
+        with open(path, 'a') as f:
+            f.write('<trk>')
+        with self.assertRaises(ValueError):
+            self.import_files(path)
+
+    def test_gpx_parsing_memory_is_bounded(self):
+        # A ~1 MB file takes over 5 MB as a whole tree, while streaming stays at a few hundred KB
+        start = datetime(2024, 1, 1)
+        trackpoints = [(start + timedelta(seconds=second), 120) for second in range(5000)]
+        path = self.write_gpx('day.gpx', trackpoints)
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in iter_gpx_samples(path))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, len(trackpoints))
+        self.assertLess(peak, 1024 * 1024)
+
+if __name__ == '__main__':
+    unittest.main()
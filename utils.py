@@ -58,4 +58,29 @@ def get_date_input(prompt, allow_blank=False):
             date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
             return date
         except ValueError:
-            print("Invalid date format. Please enter the date in YYYY-MM-DD format.")
\ No newline at end of file
+            print("Invalid date format. Please enter the date in YYYY-MM-DD format.")
+
+def get_activity_entries_input(prompt, activities):
+    # Entries are separated by ';', each entry is "YYYY-MM-DD,activity,minutes"
+    while True:
+        entries_str = input(f"{prompt}")
+        entries = []
+        try:
+            for entry_str in entries_str.split(';'):
+                if not entry_str.strip():
+                    continue
+                date_str, activity, minutes_str = [part.strip() for part in entry_str.split(',')]
+                date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+                activity = activity.lower()
+                if activity not in activities:
+                    raise ValueError(f"Unknown activity: {activity}")
+                minutes = float(minutes_str)
+                if minutes <= 0:
+                    raise ValueError(f"duration must be greater than zero minutes: {minutes_str}")
+                entries.append((date, activity, minutes))
+        except ValueError as e:
+            print(f"Invalid entry ({e}). Please enter entries as YYYY-MM-DD,activity,minutes separated by ';'.")
+            continue
+        if entries:
+            return entries
+        print("Please enter at least one entry.")
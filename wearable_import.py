@@ -0,0 +1,237 @@
+# wearable_import.py
+# Author: Huy Vu
+# Description: Streams minute-level wearable exports (CSV or GPX) into daily calories burned.
+
+import csv
+import datetime
+import os
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Column names recognised in CSV exports (compared lowercase)
+TIMESTAMP_COLUMNS = ('timestamp', 'datetime', 'date_time', 'time', 'date')
+ACTIVE_ENERGY_COLUMNS = ('active_calories', 'active_energy', 'active_kcal')
+# Energy columns without "active" are total energy, including the resting energy already counted in the TDEE
+TOTAL_ENERGY_COLUMNS = ('calories', 'energy', 'kcal')
+HEART_RATE_COLUMNS = ('heart_rate', 'heartrate', 'hr', 'bpm')
+STEPS_COLUMNS = ('steps', 'step_count')
+
+# Longer gaps between samples (device off, not worn) are not counted as activity
+MAX_SAMPLE_GAP_MINUTES = 10
+
+# Time covered by an energy reading that follows no sample or a gap, as exports are minute-level
+DEFAULT_SAMPLE_MINUTES = 1
+
+# Heart rates below this fraction of the estimated maximum (220 - age) are not counted as activity;
+# the Keytel estimate is only valid for exercise heart rates
+ACTIVE_HEART_RATE_FRACTION = 0.5
+
+# Rough energy cost of a step per kg of body weight, used when only steps are available
+CALORIES_PER_STEP_PER_KG = 0.0005
+
+# Number of days written per transaction
+DEFAULT_BATCH_SIZE = 500
+
+def parse_timestamp(value):
+    # Returned as naive local time, so samples are grouped by the user's local day and
+    # timestamps with and without an offset can be compared
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    timestamp = datetime.datetime.fromisoformat(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+def _parse_number(value):
+    if value is None or value.strip() == '':
+        return None
+    return float(value)
+
+def _find_column(fieldnames, candidates):
+    for candidate in candidates:
+        if candidate in fieldnames:
+            return fieldnames[candidate]
+    return None
+
+def iter_csv_samples(path):
+    """
+    Yields samples from a CSV export one row at a time.
+
+    Parameters:
+        path (str): Path to the CSV file.
+
+    Yields:
+        tuple: (timestamp, active_kcal, total_kcal, heart_rate, steps); missing values are None.
+    """
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+        timestamp_column = _find_column(fieldnames, TIMESTAMP_COLUMNS)
+        if timestamp_column is None:
+            raise ValueError(f"No timestamp column found in {path}")
+        active_energy_column = _find_column(fieldnames, ACTIVE_ENERGY_COLUMNS)
+        total_energy_column = _find_column(fieldnames, TOTAL_ENERGY_COLUMNS)
+        heart_rate_column = _find_column(fieldnames, HEART_RATE_COLUMNS)
+        steps_column = _find_column(fieldnames, STEPS_COLUMNS)
+        for row in reader:
+            if not row.get(timestamp_column):
+                continue
+            yield (
+                parse_timestamp(row[timestamp_column]),
+                _parse_number(row.get(active_energy_column)) if active_energy_column else None,
+                _parse_number(row.get(total_energy_column)) if total_energy_column else None,
+                _parse_number(row.get(heart_rate_column)) if heart_rate_column else None,
+                _parse_number(row.get(steps_column)) if steps_column else None
+            )
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1].lower()
+
+def iter_gpx_samples(path):
+    """
+    Yields samples from a GPX track one trackpoint at a time.
+
+    Heart rate is read from the trackpoint extensions (e.g., Garmin's TrackPointExtension).
+    Processed elements are cleared so memory stays bounded on large files.
+
+    Parameters:
+        path (str): Path to the GPX file.
+
+    Yields:
+        tuple: (timestamp, active_kcal, total_kcal, heart_rate, steps); missing values are None.
+    """
+    try:
+        # Open elements from the root down, so finished trackpoints can be detached from their parent
+        parents = []
+        for event, elem in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                parents.append(elem)
+                continue
+            parents.pop()
+            if _local_name(elem.tag) != 'trkpt':
+                continue
+            timestamp = None
+            heart_rate = None
+            for child in elem.iter():
+                name = _local_name(child.tag)
+                if name == 'time' and child.text:
+                    timestamp = parse_timestamp(child.text)
+                elif name in ('hr', 'heartrate') and child.text:
+                    heart_rate = float(child.text)
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
+            if timestamp is not None:
+                yield (timestamp, None, None, heart_rate, None)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid GPX file {path}: {e}")
+
+def iter_samples(path):
+    if path.lower().endswith('.gpx'):
+        return iter_gpx_samples(path)
+    return iter_csv_samples(path)
+
+def heart_rate_calories_per_minute(heart_rate, weight_kg, age, gender):
+    # Keytel et al. (2005) heart rate based estimate of total energy expenditure; clamped at zero
+    if gender.lower() == 'male':
+        kj = -55.0969 + 0.6309 * heart_rate + 0.1988 * weight_kg + 0.2017 * age
+    else:
+        kj = -20.4022 + 0.4472 * heart_rate - 0.1263 * weight_kg + 0.074 * age
+    return max(kj / 4.184, 0)
+
+def iter_sample_calories(samples, weight_kg, age, gender, resting_calories_per_minute):
+    """
+    Converts samples into (date, active calories) pairs.
+
+    Only active energy is counted, as resting energy is already part of the TDEE. Active energy
+    readings are used as-is, and resting energy is subtracted from total energy readings. Otherwise
+    calories are estimated from heart rate over the time elapsed since the previous sample, counting
+    only exercise heart rates, or from the step count.
+    """
+    active_heart_rate = ACTIVE_HEART_RATE_FRACTION * (220 - age)
+    previous_timestamp = None
+    for timestamp, active_energy, total_energy, heart_rate, steps in samples:
+        if previous_timestamp is not None:
+            minutes = (timestamp - previous_timestamp).total_seconds() / 60
+            if minutes < 0 or minutes > MAX_SAMPLE_GAP_MINUTES:
+                minutes = 0
+        else:
+            minutes = 0
+        previous_timestamp = timestamp
+
+        if active_energy is not None:
+            calories = active_energy
+        elif total_energy is not None:
+            calories = max(total_energy - resting_calories_per_minute * (minutes or DEFAULT_SAMPLE_MINUTES), 0)
+        elif heart_rate is not None:
+            if heart_rate < active_heart_rate:
+                calories = 0
+            else:
+                total_per_minute = heart_rate_calories_per_minute(heart_rate, weight_kg, age, gender)
+                calories = max(total_per_minute - resting_calories_per_minute, 0) * minutes
+        elif steps is not None:
+            calories = steps * CALORIES_PER_STEP_PER_KG * weight_kg
+        else:
+            continue
+        yield timestamp.date(), calories
+
+def aggregate_daily_calories(date_calories):
+    daily_calories = defaultdict(float)
+    for date, calories in date_calories:
+        daily_calories[date] += calories
+    return dict(daily_calories)
+
+def import_file(path, weight_kg, age, gender, resting_calories_per_minute):
+    """
+    Streams a single export file into per-day active calories burned.
+
+    Returns:
+        dict: Calories burned keyed by date.
+    """
+    samples = iter_samples(path)
+    return aggregate_daily_calories(iter_sample_calories(samples, weight_kg, age, gender, resting_calories_per_minute))
+
+def _batches(items, batch_size):
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def import_wearable_files(paths, data_storage, user, weight_kg, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Imports wearable exports and saves the daily active calories burned.
+
+    Each file is saved as its own source, so importing a file again only adds the difference
+    with what was imported from it before.
+
+    Parameters:
+        paths (list): Paths to CSV or GPX export files.
+        data_storage (StorageBackend): Storage the daily totals are written to.
+        user (UserProfile): Profile used for heart rate based estimates.
+        weight_kg (float): Body weight in kilograms.
+        workers (int): Number of files parsed in parallel processes.
+        batch_size (int): Number of days written per transaction.
+
+    Returns:
+        dict: Calories burned added, keyed by date.
+    """
+    resting_calories_per_minute = user.calculate_bmr(weight_kg) / (24 * 60)
+    args = [(path, weight_kg, user.age, user.gender, resting_calories_per_minute) for path in paths]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(import_file, *zip(*args)))
+    else:
+        results = [import_file(*file_args) for file_args in args]
+
+    daily_calories = defaultdict(float)
+    for path, result in zip(paths, results):
+        source = os.path.basename(path)
+        for batch in _batches(sorted(result.items()), batch_size):
+            for date, calories in data_storage.save_imported_calories(source, batch):
+                daily_calories[date] += calories
+    return dict(daily_calories)